@@ -4,14 +4,23 @@ Author : Milton Rocha
 Medium : https://medium.com/@milton-rocha
 """
 
-dependencies = ('copy',
+dependencies = ('abc',
+                'asyncio',
+                'collections',
+                'copy',
                 'datetime',
                 'dateutil',
+                'functools',
+                'glob',
+                'hashlib',
+                'json',
+                'multiprocessing',
                 'numpy',
                 'os',
                 'pandas',
                 'tabulate',
                 'tempfile',
+                'threading',
                 'typeguard',
                 'typing')
 
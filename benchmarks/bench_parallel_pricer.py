@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Author : Milton Rocha
+Medium : https://medium.com/@milton-rocha
+
+Benchmark de escalabilidade do ParallelPricer
+
+    Mede a parte serial executada no processo principal (parâmetros das
+posições e limite de fluxos para o balanceamento das fatias), a geração
+completa do CashflowTable (etapa que agora roda dentro dos processos) e o
+tempo do ParallelPricer para 1, 2, 4, ... processos até os.cpu_count()
+
+Uso:
+    python benchmarks/bench_parallel_pricer.py [n_posicoes]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calc_utils      import (CashflowTable,
+                             coupon_count_bound)
+from date_utils      import as_calendar
+from parallel_pricer import ParallelPricer
+from pricer          import (BondPortfolio,
+                             position_params)
+
+VAL_DATE = '2022-07-29'
+
+def _cronometro(func, repeticoes : int = 3) -> float:
+
+    """
+    Menor tempo (segundos) entre as repetições
+    """
+
+    tempos = []
+    for _ in range(repeticoes):
+        t = time.perf_counter()
+        func()
+        tempos.append(time.perf_counter() - t)
+
+    return min(tempos)
+
+def main(n : int = 200_000):
+
+    rng = np.random.default_rng(0)
+    instrumentos = np.where(rng.random(n) < .5, 'NTNF', 'LTN')
+    vencimentos  = np.datetime64('2023-01-01') + rng.integers(100, 8000, n)
+    taxas        = rng.uniform(.08, .14, n)
+    calendario   = as_calendar(None)
+
+    params = position_params(instrumentos, n)
+
+    serial = _cronometro(lambda: coupon_count_bound(vencimentos, position_params(instrumentos, n)['coupon_frequency'], VAL_DATE))
+    tabela = _cronometro(lambda: CashflowTable.from_schedule(VAL_DATE, vencimentos, params['annual_coupon'],
+                                                             params['coupon_frequency'], calendario))
+    base   = _cronometro(lambda: BondPortfolio(VAL_DATE, instrumentos, vencimentos, taxas, holidays = calendario).krdv01())
+
+    print(f'posições                          : {n}')
+    print(f'parte serial (processo principal) : {serial:.3f} s')
+    print(f'CashflowTable completo            : {tabela:.3f} s (nos processos)')
+    print(f'BondPortfolio + krdv01 (serial)   : {base:.3f} s')
+    print(f'speed-up máximo (Amdahl)          : {base / serial:.1f}x')
+    print()
+
+    processos, w = [], 1
+    while w <= (os.cpu_count() or 1):
+        processos.append(w)
+        w *= 2
+
+    for w in processos:
+        pricer = ParallelPricer(w)
+        tempo  = _cronometro(lambda: pricer(VAL_DATE, instrumentos, vencimentos, taxas, holidays = calendario))
+        print(f'n_workers = {w:>3} : {tempo:.3f} s, speed-up vs serial = {base / tempo:.2f}x')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
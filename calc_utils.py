@@ -6,12 +6,153 @@ Medium : https://medium.com/@milton-rocha
 
 import pandas as pd
 import numpy  as np
+import threading
 
-from date_utils  import (feriados,
-                         edate)
+from abc         import ABC, abstractmethod
+from collections import OrderedDict
+from functools   import lru_cache
+
+from date_utils  import (BusinessCalendar,
+                         as_calendar)
 from typeguard   import check_type
 from typing      import Union
 
+
+def coupon_count_bound(vencimentos : Union[str, np.datetime64, list, np.ndarray],
+                       frequencias : Union[int, list, np.ndarray],
+                       val_date    : Union[str, np.datetime64]) -> np.ndarray:
+
+    """
+    Limite superior (no máximo 2 fluxos a mais) da quantidade de fluxos de cada
+    título, calculado só com a aritmética de meses, sem gerar as datas (vide coupon_schedule)
+
+    Variáveis:
+        vencimentos : vencimentos (não rolados) dos títulos
+        frequencias : frequência anual de cupons de cada título (0 = sem cupom)
+        val_date    : data de valuation comum a todos os títulos
+
+    Resposta:
+        np.ndarray de inteiros com o limite de fluxos de cada título
+    """
+
+    vencimentos = np.atleast_1d(np.asarray(vencimentos, dtype = 'datetime64[D]'))
+    frequencias = np.broadcast_to(np.asarray(frequencias, dtype = np.int64), vencimentos.shape)
+    val_date    = np.datetime64(val_date, 'D')
+
+    # Passo, em meses, entre cupons (0 para títulos sem cupom)
+    passo = np.where(frequencias != 0, 12 // np.where(frequencias != 0, frequencias, 1), 0)
+
+    # Títulos sem cupom possuem somente o vencimento
+    meses_ate_venc = (vencimentos.astype('datetime64[M]') - val_date.astype('datetime64[M]')).astype(np.int64)
+
+    return np.where(passo != 0, np.maximum(meses_ate_venc, -1) // np.maximum(passo, 1) + 2, 1)
+
+
+def coupon_schedule(vencimentos : Union[str, np.datetime64, list, np.ndarray],
+                    frequencias : Union[int, list, np.ndarray],
+                    val_date    : Union[str, np.datetime64]) -> tuple:
+
+    """
+    Gerador vetorizado de datas de cupom para um conjunto de vencimentos
+
+        Equivalente a aplicar edate(fluxo, -12/freq) sucessivamente a partir do
+    vencimento de cada título enquanto fluxo > val_date (vide Fluxos), porém
+    feito em uma única passagem do numpy com aritmética de meses em
+    'datetime64[M]'. Assim como no edate encadeado, o dia de cada fluxo é
+    limitado ao último dia de cada mês já percorrido (31/08 -> 28/02 -> 28/08)
+
+    Variáveis:
+        vencimentos : vencimentos (não rolados) dos títulos
+        frequencias : frequência anual de cupons de cada título (0 = sem cupom)
+        val_date    : data de valuation comum a todos os títulos
+
+    Resposta:
+        datas   : np.ndarray 'datetime64[D]' com todas as datas de cupom, em ordem
+                  crescente dentro de cada título
+        offsets : np.ndarray de tamanho len(vencimentos) + 1, as datas do título i
+                  são datas[offsets[i] : offsets[i + 1]]
+    """
+
+    vencimentos = np.atleast_1d(np.asarray(vencimentos, dtype = 'datetime64[D]'))
+    frequencias = np.broadcast_to(np.asarray(frequencias, dtype = np.int64), vencimentos.shape)
+    val_date    = np.datetime64(val_date, 'D')
+
+    # Passo, em meses, entre cupons (0 para títulos sem cupom)
+    passo = np.where(frequencias != 0, 12 // np.where(frequencias != 0, frequencias, 1), 0)
+
+    mes_venc = vencimentos.astype('datetime64[M]')
+    dia_venc = (vencimentos - mes_venc.astype('datetime64[D]')).astype(np.int64) + 1
+
+    # Quantidade máxima de fluxos de cada título (limite superior)
+    n_max = coupon_count_bound(vencimentos, frequencias, val_date)
+
+    k = np.arange(n_max.max() if len(n_max) else 0, dtype = np.int64)
+    meses = mes_venc[:, None] - (k[None, :] * passo[:, None]).astype('timedelta64[M]')
+
+    # Dia do fluxo: limitado pela menor quantidade de dias dos meses já percorridos
+    dias_mes = ((meses + 1).astype('datetime64[D]') - meses.astype('datetime64[D]')).astype(np.int64)
+    dias = np.minimum(dia_venc[:, None], np.minimum.accumulate(dias_mes, axis = 1))
+
+    datas = meses.astype('datetime64[D]') + (dias - 1).astype('timedelta64[D]')
+
+    # Fluxos válidos: posteriores à val_date, ou somente o vencimento para títulos sem cupom
+    validos = np.where(passo[:, None] != 0, datas > val_date, k[None, :] == 0) & (k[None, :] < n_max[:, None])
+
+    # Inverte as colunas para que as datas fiquem em ordem crescente dentro de cada título
+    datas   = datas[:, ::-1][validos[:, ::-1]]
+    offsets = np.zeros(len(vencimentos) + 1, dtype = np.int64)
+    np.cumsum(validos.sum(axis = 1), out = offsets[1:])
+
+    return datas, offsets
+
+
+def fluxos_vetorizados(valDate     : Union[str, np.datetime64],
+                       vencimentos : Union[list, np.ndarray],
+                       cupomAnual  : Union[float, list, np.ndarray],
+                       freqCupons  : Union[int, list, np.ndarray],
+                       fer         : Union[BusinessCalendar, list, np.ndarray, None] = None,
+                       busDay_roll : bool = True) -> dict:
+
+    """
+    Versão vetorizada de Fluxos para um conjunto de títulos com a mesma data de valuation
+
+        Fornece, em arrays contíguos, o mesmo resultado de Fluxos(...)() para
+    cada um dos títulos, sem construção de objetos por título
+
+    Resposta:
+        dict : 'Cupom' (datas dos fluxos), 'du' (dias úteis de cada fluxo),
+               'fator' (fator de juros de cada fluxo), 'offsets' (os fluxos do
+               título i estão em [offsets[i] : offsets[i + 1]]) e 'vencimento'
+               (vencimento, rolado caso busDay_roll = True, de cada título)
+    """
+
+    calendar    = as_calendar(fer)
+    valDate     = np.datetime64(valDate, 'D')
+    vencimentos = np.atleast_1d(np.asarray(vencimentos, dtype = 'datetime64[D]'))
+    cupomAnual  = np.broadcast_to(np.asarray(cupomAnual, dtype = float), vencimentos.shape)
+    freqCupons  = np.broadcast_to(np.asarray(freqCupons, dtype = np.int64), vencimentos.shape)
+
+    cupons, offsets = coupon_schedule(vencimentos, freqCupons, valDate)
+
+    if busDay_roll:
+        cupons      = calendar.roll(cupons, roll = 'forward')
+        vencimentos = calendar.roll(vencimentos, roll = 'forward')
+
+    # Valor do cupom de cada título, conforme Fluxos.__calc__
+    valorCupom = np.where(freqCupons != 0,
+                          (1.0 + cupomAnual) ** (1.0 / np.where(freqCupons != 0, freqCupons, 1)),
+                          1.0 + cupomAnual)
+
+    # Fluxos no vencimento pagam juros + principal, os demais somente juros
+    titulo  = np.repeat(np.arange(len(vencimentos)), np.diff(offsets))
+    fatores = np.where(cupons != vencimentos[titulo], valorCupom[titulo] - 1.0, valorCupom[titulo])
+
+    return {'Cupom'      : cupons,
+            'du'         : calendar.busday_count(valDate, cupons),
+            'fator'      : fatores,
+            'offsets'    : offsets,
+            'vencimento' : vencimentos}
+
 class Fluxos:
 
         """
@@ -23,7 +164,7 @@ class Fluxos:
                      vencimento   : Union[str, np.datetime64, None],
                      cupomAnual   : Union[float, int],
                      freqCupons   : int = 2,
-                     fer          : Union[list, np.ndarray, pd.core.frame.DataFrame, None] = None,
+                     fer          : Union[BusinessCalendar, list, np.ndarray, pd.core.frame.DataFrame, None] = None,
                      busDay_roll  : bool = True,
                      check_inputs : bool = False):
 
@@ -32,7 +173,9 @@ class Fluxos:
 
             # Caso o usuário não forneça alguma variável (que possa ser None) a classe atribuirá variável default
             if not self.valDate: self.valDate = np.datetime64('today', 'D')
-            self.fer = feriados() if self.fer is None else self.fer
+            # Calendário de dias úteis pré-calculado (reaproveitado entre objetos com os mesmos feriados)
+            self.calendar = as_calendar(self.fer)
+            self.fer = self.calendar if self.fer is None else self.fer
             
             # Caso a valDate ou o vencimento sejam inseridos como str, serão convertidos para datetime64, formato 'YYYY-MM-DD'
             self.valDate = self.valDate if isinstance(self.valDate, np.datetime64) else np.datetime64(self.valDate, 'D')
@@ -50,7 +193,7 @@ class Fluxos:
             check_type('vencimento',  self.vencimento, Union[str, np.datetime64, None])
             check_type('cupomAnual',  self.cupomAnual, Union[float, int])
             check_type('freqCupons',  self.freqCupons, int)
-            check_type('fer',         self.fer, Union[list, np.ndarray, pd.core.frame.DataFrame, None])
+            check_type('fer',         self.fer, Union[BusinessCalendar, list, np.ndarray, pd.core.frame.DataFrame, None])
             check_type('busDay_roll', self.busDay_roll, bool)
         
         
@@ -59,30 +202,22 @@ class Fluxos:
             # O valorCupom é definido como o valor de pagamento, em percentual, para um determinado padrão de juros com frequência n
             
             self.valorCupom = (1.0 + self.cupomAnual) ** (1.0 / self.freqCupons) if self.freqCupons != 0 else (1.0 + self.cupomAnual)
-            self.cupons = []
-
-            # Começamos ao contrário, estipulado que o primeiro fluxo será o da data de vencimento do papel
-            fluxo = self.vencimento
 
-            # Enquanto o fluxo calculado for maior que a data de valuation, o fluxo será considerado e adicionado à lista
-            if self.freqCupons != 0:
-                while fluxo > self.valDate:
-                    self.cupons.append(fluxo)
-                    fluxo = edate(fluxo, -int(12.0 / self.freqCupons))
-            else:
-                self.cupons.append(fluxo)
+            #  Os fluxos são gerados a partir da data de vencimento do papel, voltando de 12/freq em 12/freq meses
+            # enquanto o fluxo calculado for maior que a data de valuation (vide coupon_schedule)
+            self.cupons, _ = coupon_schedule(self.vencimento, self.freqCupons, self.valDate)
 
             #  Caso o usuário deseje que o código retorne o próximo dia útil,
             # o código irá rolar todas as datas de fluxo para o dia útil seguinte
-            if self.busDay_roll: self.cupons = np.busday_offset(self.cupons, 0, roll='forward', holidays = self.fer)
-            if self.busDay_roll: self.vencimento = np.busday_offset(self.vencimento, 0, roll = 'forward', holidays = self.fer)
+            if self.busDay_roll: self.cupons = self.calendar.roll(self.cupons, roll = 'forward')
+            if self.busDay_roll: self.vencimento = self.calendar.roll(self.vencimento, roll = 'forward')
 
             #  Para garantir que os fluxos estejam em ordem crescente (inversa ao que foi construído),
             # é necessário um np.sort()
             self.cupons = np.sort(self.cupons)
 
             # São calculados os dias úteis para cada um dos fluxos
-            self.dus = np.busday_count(self.valDate, self.cupons, holidays = self.fer)
+            self.dus = self.calendar.busday_count(self.valDate, self.cupons)
 
             #  Os fatores de juros são atribuídos como sendo somente juros semestrais para as datas de cupom e
             # semestrais + principal no vencimento
@@ -95,6 +230,18 @@ class Fluxos:
                     'du'    : self.dus,
                     'fator' : self.fatores}
         
+        def to_table(self) -> 'CashflowTable':
+
+            """
+            Emite os fluxos em um CashflowTable de um único título
+
+                Para vários títulos utilize CashflowTable.from_fluxos([fluxos]) (ou
+            CashflowTable.from_schedule), que concatenam os arrays uma única vez
+            """
+
+            return CashflowTable(self.cupons, self.dus, self.fatores, np.array([0, len(self.cupons)]),
+                                 vencimentos = np.atleast_1d(self.vencimento))
+
         def __len__(self):
             return len(self.cupons)
         
@@ -107,7 +254,449 @@ class Fluxos:
             return f'Fluxos(valDate = {self.valDate}, vencimento = {self.vencimento}, cupomAnual = {self.cupomAnual}, freqCupons = {self.freqCupons}, busDay_roll = {self.busDay_roll})'
 
 
-class FlatForward:
+class CashflowTable:
+
+        """
+        Tabela colunar (struct-of-arrays) de fluxos de caixa de um portfólio inteiro
+
+            Todos os fluxos de todos os títulos ficam em arrays contíguos (id do
+        título, data de pagamento, dias úteis e fator), com offsets por título:
+        os fluxos do título i estão em [offsets[i] : offsets[i + 1]]. Preço e
+        riscos de portfólio são calculados diretamente sobre esses arrays, sem
+        um objeto Python por título
+
+        Variáveis:
+            cupons      : datas de pagamento de cada fluxo
+            dus         : dias úteis até cada fluxo
+            fatores     : fator de juros de cada fluxo
+            offsets     : offsets por título (tamanho n_titulos + 1)
+            vencimentos : vencimento (rolado) de cada título, opcional
+        """
+
+        def __init__(self,
+                     cupons      : np.ndarray,
+                     dus         : np.ndarray,
+                     fatores     : np.ndarray,
+                     offsets     : np.ndarray,
+                     vencimentos : Union[np.ndarray, None] = None):
+
+            self.cupons      = np.asarray(cupons, dtype = 'datetime64[D]')
+            self.dus         = np.asarray(dus, dtype = np.int64)
+            self.fatores     = np.asarray(fatores, dtype = float)
+            self.offsets     = np.asarray(offsets, dtype = np.int64)
+            self.vencimentos = None if vencimentos is None else np.asarray(vencimentos, dtype = 'datetime64[D]')
+
+            assert len(self.cupons) == len(self.dus) == len(self.fatores) == self.offsets[-1], \
+                'Cupons, dus e fatores devem ter o tamanho total indicado pelos offsets'
+
+            # Id do título de cada fluxo
+            self.bond_id = np.repeat(np.arange(self.n_bonds), np.diff(self.offsets))
+
+        @classmethod
+        def from_schedule(cls,
+                          valDate     : Union[str, np.datetime64],
+                          vencimentos : Union[list, np.ndarray],
+                          cupomAnual  : Union[float, list, np.ndarray],
+                          freqCupons  : Union[int, list, np.ndarray],
+                          fer         : Union[BusinessCalendar, list, np.ndarray, None] = None,
+                          busDay_roll : bool = True) -> 'CashflowTable':
+
+            """
+            Constrói a tabela diretamente dos parâmetros dos títulos (vide fluxos_vetorizados)
+            """
+
+            fs = fluxos_vetorizados(valDate, vencimentos, cupomAnual, freqCupons, fer, busDay_roll)
+            return cls(fs['Cupom'], fs['du'], fs['fator'], fs['offsets'], fs['vencimento'])
+
+        @classmethod
+        def from_fluxos(cls,
+                        fluxos : list) -> 'CashflowTable':
+
+            """
+            Constrói a tabela a partir de uma lista de objetos Fluxos (um título por objeto)
+            """
+
+            offsets = np.zeros(len(fluxos) + 1, dtype = np.int64)
+            np.cumsum([len(fs) for fs in fluxos], out = offsets[1:])
+
+            return cls(np.concatenate([fs.cupons for fs in fluxos]) if fluxos else np.array([], dtype = 'datetime64[D]'),
+                       np.concatenate([fs.dus for fs in fluxos]) if fluxos else np.array([], dtype = np.int64),
+                       np.concatenate([fs.fatores for fs in fluxos]) if fluxos else np.array([], dtype = float),
+                       offsets,
+                       np.array([fs.vencimento for fs in fluxos], dtype = 'datetime64[D]'))
+
+        @classmethod
+        def concat(cls,
+                   tables : list) -> 'CashflowTable':
+
+            """
+            Concatena tabelas, os títulos de cada tabela são numerados na sequência fornecida
+            """
+
+            offsets = [np.zeros(1, dtype = np.int64)]
+            for t in tables: offsets.append(t.offsets[1:] + offsets[-1][-1])
+
+            vencimentos = None if any(t.vencimentos is None for t in tables) else \
+                          np.concatenate([t.vencimentos for t in tables])
+
+            return cls(np.concatenate([t.cupons for t in tables]),
+                       np.concatenate([t.dus for t in tables]),
+                       np.concatenate([t.fatores for t in tables]),
+                       np.concatenate(offsets),
+                       vencimentos)
+
+        @property
+        def n_bonds(self) -> int:
+            return len(self.offsets) - 1
+
+        @property
+        def nbytes(self) -> int:
+            return sum(arr.nbytes for arr in (self.cupons, self.dus, self.fatores, self.offsets, self.bond_id))
+
+        def bond_sum(self,
+                     valores : np.ndarray) -> np.ndarray:
+
+            """
+            Soma, por título, valores definidos por fluxo (último eixo), ex.: valor presente de cada fluxo -> preço
+            """
+
+            valores  = np.asarray(valores, dtype = float)
+            out      = np.zeros(valores.shape[:-1] + (self.n_bonds,))
+            nonempty = np.diff(self.offsets) > 0
+
+            if valores.shape[-1]:
+                out[..., nonempty] = np.add.reduceat(valores, self.offsets[:-1][nonempty], axis = -1)
+
+            return out
+
+        def expand(self,
+                   valores : np.ndarray) -> np.ndarray:
+
+            """
+            Expande valores definidos por título (último eixo) para cada um dos seus fluxos
+            """
+
+            return np.asarray(valores)[..., self.bond_id]
+
+        def slice(self,
+                  inicio : int,
+                  fim    : int) -> 'CashflowTable':
+
+            """
+            Sub-tabela dos títulos [inicio : fim], os arrays são views da tabela original
+            """
+
+            a, b = self.offsets[inicio], self.offsets[fim]
+
+            return CashflowTable(self.cupons[a : b], self.dus[a : b], self.fatores[a : b],
+                                 self.offsets[inicio : fim + 1] - a,
+                                 None if self.vencimentos is None else self.vencimentos[inicio : fim])
+
+        def __getitem__(self,
+                        i : int) -> dict:
+
+            # Mesmo formato de Fluxos.__call__ para o título i
+            sl = slice(self.offsets[i], self.offsets[i + 1])
+            return {'Cupom' : self.cupons[sl],
+                    'du'    : self.dus[sl],
+                    'fator' : self.fatores[sl]}
+
+        def __len__(self):
+            return len(self.dus)
+
+        def __str__(self):
+            return f'CashflowTable(bonds = {self.n_bonds}, flows = {len(self.dus)}, nbytes = {self.nbytes})'
+
+        def __repr__(self):
+            return self.__str__()
+
+
+class FluxosCache:
+
+        """
+        Cache LRU, limitado e thread-safe, de objetos Fluxos
+
+            Fluxos idênticos (mesma valDate, vencimento, cupom, frequência,
+        calendário e rolagem) são calculados uma única vez e compartilhados.
+        Os arrays dos objetos em cache são somente leitura
+
+        Variáveis:
+            maxsize : quantidade máxima de Fluxos mantidos em cache
+
+        Contadores disponíveis: hits, misses e evictions (vide stats())
+        """
+
+        def __init__(self,
+                     maxsize : int = 1024):
+
+            self.maxsize   = maxsize
+            self.hits      = 0
+            self.misses    = 0
+            self.evictions = 0
+
+            self._fluxos = OrderedDict()
+            self._lock   = threading.Lock()
+
+        def get(self,
+                valDate     : Union[str, np.datetime64, None],
+                vencimento  : Union[str, np.datetime64],
+                cupomAnual  : Union[float, int],
+                freqCupons  : int = 2,
+                fer         : Union[BusinessCalendar, list, np.ndarray, None] = None,
+                busDay_roll : bool = True) -> 'Fluxos':
+
+            """
+            Retorna o Fluxos dos parâmetros fornecidos, calculando-o somente caso não esteja em cache
+            """
+
+            calendar = as_calendar(fer)
+            valDate  = np.datetime64('today', 'D') if not valDate else np.datetime64(valDate, 'D')
+            chave    = (valDate, np.datetime64(vencimento, 'D'), float(cupomAnual), int(freqCupons), calendar.key, bool(busDay_roll))
+
+            with self._lock:
+                if chave in self._fluxos:
+                    self.hits += 1
+                    self._fluxos.move_to_end(chave)
+                    return self._fluxos[chave]
+                self.misses += 1
+
+            # O cálculo é feito fora do lock, para não bloquear as demais threads
+            fs = Fluxos(valDate, chave[1], cupomAnual, freqCupons, calendar, busDay_roll)
+            for arr in (fs.cupons, fs.dus, fs.fatores): arr.flags.writeable = False
+
+            with self._lock:
+                fs = self._fluxos.setdefault(chave, fs)
+                self._fluxos.move_to_end(chave)
+                while len(self._fluxos) > self.maxsize:
+                    self._fluxos.popitem(last = False)
+                    self.evictions += 1
+
+            return fs
+
+        def stats(self) -> dict:
+            return {'hits'      : self.hits,
+                    'misses'    : self.misses,
+                    'evictions' : self.evictions,
+                    'size'      : len(self._fluxos),
+                    'maxsize'   : self.maxsize}
+
+        def clear(self):
+
+            with self._lock:
+                self._fluxos.clear()
+                self.hits, self.misses, self.evictions = 0, 0, 0
+
+        def __len__(self):
+            return len(self._fluxos)
+
+        def __str__(self):
+            return f'FluxosCache(maxsize = {self.maxsize}, size = {len(self._fluxos)}, hits = {self.hits}, misses = {self.misses}, evictions = {self.evictions})'
+
+        def __repr__(self):
+            return self.__str__()
+
+
+# Cache padrão de Fluxos, utilizado pelo Bond
+FLUXOS_CACHE = FluxosCache()
+
+
+class KeyRateWeights:
+
+        """
+        Matriz esparsa de alocação de exposições (por dias úteis) nos buckets de risco
+
+            Cada prazo em dias úteis é alocado em no máximo dois buckets, de
+        forma que a matriz (dias úteis x buckets) é guardada como dois arrays de
+        índices e dois de pesos, pré-calculados até o maior bucket. Regras de
+        alocação (as mesmas do Bond.__bucketting__):
+            - prazo igual a um bucket  : 100% no bucket
+            - prazo entre dois buckets : interpolação linear entre os buckets
+            - prazo abaixo do primeiro : primeiro bucket, escalado por du/min
+            - prazo acima do último    : último bucket, escalado por du/max
+
+        Variáveis:
+            buckets : prazos, em dias úteis, dos buckets de risco
+        """
+
+        def __init__(self,
+                     buckets : Union[list, tuple, np.ndarray]):
+
+            self.buckets = np.sort(np.asarray(buckets, dtype = np.int64))
+
+            min_serie, max_serie = self.buckets[0], self.buckets[-1]
+            dus = np.arange(max_serie + 1)
+
+            # Bucket posterior (post) e anterior (ant) de cada prazo
+            post = np.clip(np.searchsorted(self.buckets, dus, side = 'left'), 0, len(self.buckets) - 1)
+            ant  = np.clip(post - 1, 0, None)
+            exato = self.buckets[post] == dus
+
+            ant = np.where(exato | (dus < min_serie), post, ant)
+            with np.errstate(divide = 'ignore', invalid = 'ignore'):
+                peso_ant  = np.where(ant == post, 0., (self.buckets[post] - dus) / (self.buckets[post] - self.buckets[ant]))
+            peso_post = np.where(exato, 1., np.where(dus < min_serie, dus / min_serie, 1. - peso_ant))
+
+            self.indices = np.stack([ant, post], axis = 1)
+            self.weights = np.stack([peso_ant, peso_post], axis = 1)
+
+        def __lookup__(self,
+                       dus : np.ndarray) -> tuple:
+
+            """
+            Índices e pesos (n x 2) de cada prazo, prazos acima do último bucket são escalados por du/max
+            """
+
+            dus   = np.asarray(dus, dtype = np.int64)
+            acima = dus > self.buckets[-1]
+            pos   = np.minimum(dus, self.buckets[-1])
+
+            indices = self.indices[pos]
+            weights = self.weights[pos]
+
+            if acima.any():
+                weights = weights.copy()
+                weights[acima] = np.stack([np.zeros(acima.sum()), dus[acima] / self.buckets[-1]], axis = 1)
+
+            return indices, weights
+
+        def allocate(self,
+                     dus        : np.ndarray,
+                     exposicoes : np.ndarray,
+                     grupos     : Union[np.ndarray, None] = None,
+                     n_grupos   : Union[int, None] = None) -> np.ndarray:
+
+            """
+            Aloca as exposições nos buckets (produto esparso-denso)
+
+                Caso grupos (ex.: id do título de cada fluxo) seja fornecido,
+            retorna uma matriz (n_grupos x buckets), caso contrário um vetor com
+            a exposição total de cada bucket
+            """
+
+            indices, weights = self.__lookup__(dus)
+            valores = weights * np.asarray(exposicoes, dtype = float)[:, None]
+            nb = len(self.buckets)
+
+            if grupos is None:
+                return np.bincount(indices.ravel(), weights = valores.ravel(), minlength = nb)
+
+            n_grupos = int(grupos.max()) + 1 if n_grupos is None else n_grupos
+            posicao  = np.asarray(grupos, dtype = np.int64)[:, None] * nb + indices
+
+            return np.bincount(posicao.ravel(), weights = valores.ravel(), minlength = n_grupos * nb).reshape(n_grupos, nb)
+
+        def to_dense(self,
+                     max_du : Union[int, None] = None) -> np.ndarray:
+
+            """
+            Matriz densa (dias úteis x buckets) de pesos, útil para inspeção
+            """
+
+            dus = np.arange((self.buckets[-1] if max_du is None else max_du) + 1)
+            return self.allocate(dus, np.ones(len(dus)), dus, len(dus))
+
+        def __len__(self):
+            return len(self.buckets)
+
+        def __str__(self):
+            return f'KeyRateWeights(buckets = {list(self.buckets)})'
+
+        def __repr__(self):
+            return self.__str__()
+
+
+@lru_cache(maxsize = 32)
+def __key_rate_weights__(buckets : tuple) -> KeyRateWeights:
+    return KeyRateWeights(buckets)
+
+def key_rate_weights(buckets : Union[list, tuple, np.ndarray, dict]) -> KeyRateWeights:
+
+    """
+    Retorna a matriz de alocação dos buckets fornecidos, construída uma única vez por grade de buckets
+    """
+
+    buckets = buckets.values() if isinstance(buckets, dict) else buckets
+    return __key_rate_weights__(tuple(sorted(int(b) for b in buckets)))
+
+
+class YieldCurve(ABC):
+
+  """
+  Minimal yield curve protocol used by the pricers (abstract, subclasses must implement __call__)
+  - obj(maturities) returns the yields for the provided maturities (in days)
+  - obj.discount_factors(maturities) returns the discount factors for the provided maturities (in days)
+  """
+
+  days_year = 252
+  version   = 0
+
+  @abstractmethod
+  def __call__(self,
+               maturities : np.ndarray) -> np.ndarray:
+    pass
+
+  def discount_factors(self,
+                       maturities : np.ndarray,
+                       spread     : Union[float, np.ndarray] = 0.) -> np.ndarray:
+
+    """
+    Discount factors for the provided maturities, spread is added to the curve yields: (1 + r + spread) ** -(t/days_year)
+    """
+
+    maturities = np.asarray(maturities, dtype = float)
+    return 1./(1. + self(maturities) + spread) ** (maturities/self.days_year)
+
+
+class FlatCurve(YieldCurve):
+
+  """
+  Constant yield curve with closed-form discount factors
+  - Replaces a FlatForward built with the same yield on every vertex
+  """
+
+  def __init__(self,
+               bond_yield : float,
+               days_year  : int = 252):
+
+    """
+    Variables:
+      - bond_yield : float, constant yield of the curve
+      - days_year  : int, days in a year
+    """
+
+    self.bond_yield = bond_yield
+    self.days_year  = days_year
+
+  @staticmethod
+  def discount(bond_yield : Union[float, np.ndarray],
+               maturities : np.ndarray,
+               days_year  : int = 252) -> np.ndarray:
+
+    """
+    Closed-form discount factors for a constant yield, without building a curve object
+    """
+
+    return 1./(1. + bond_yield) ** (np.asarray(maturities)/days_year)
+
+  def __call__(self,
+               maturities : np.ndarray) -> np.ndarray:
+
+    maturities = maturities if isinstance(maturities, (list, np.ndarray)) else np.array([maturities])
+    return np.full(np.shape(maturities), self.bond_yield, dtype = float)
+
+  def discount_factors(self,
+                       maturities : np.ndarray,
+                       spread     : Union[float, np.ndarray] = 0.) -> np.ndarray:
+    return self.discount(self.bond_yield + spread, maturities, self.days_year)
+
+  def __str__(self):
+    return f'FlatCurve(bond_yield = {self.bond_yield}, days_year = {self.days_year})'
+
+  def __repr__(self):
+    return self.__str__()
+
+
+class FlatForward(YieldCurve):
 
   """
   Flat Forward Exponential Interpolation Method
@@ -131,11 +720,49 @@ class FlatForward:
 
     assert len(maturities) == len(yields), f'Maturities have len ({len(maturities)}) while yields have len ({len(yields)})'
 
-    self.maturities  = maturities
-    self.yields      = yields
+    self.maturities  = np.array(maturities, dtype = float)
+    self.yields      = np.array(yields, dtype = float)
     self.days_year   = days_year
     self.extrapolate = extrapolate
 
+    # Version counter, bumped on every update() so dependent objects know they are stale
+    self.version = 0
+
+    # Log discount factors of each vertex, the flat forward rule is linear in this space
+    self.log_factors = self.maturities / self.days_year * np.log1p(self.yields)
+
+    # Per-segment forward factors (log forward per day between vertices i and i + 1)
+    self.forward_factors = np.diff(self.log_factors) / np.diff(self.maturities)
+
+  def update(self,
+             vertex    : float,
+             new_yield : float):
+
+    """
+    Updates the yield of a single vertex, recomputing only the adjacent forward segments
+
+      - if the vertex does not exist in the curve it is inserted in its position
+      - every update bumps self.version
+    """
+
+    idx = int(np.searchsorted(self.maturities, vertex, side = 'left'))
+
+    if idx == len(self.maturities) or self.maturities[idx] != vertex:
+      self.maturities      = np.insert(self.maturities, idx, vertex)
+      self.yields          = np.insert(self.yields, idx, new_yield)
+      self.log_factors     = np.insert(self.log_factors, idx, 0.)
+      self.forward_factors = np.insert(self.forward_factors, min(idx, len(self.forward_factors)), 0.)
+
+    self.yields[idx]      = new_yield
+    self.log_factors[idx] = vertex / self.days_year * np.log1p(new_yield)
+
+    for seg in (idx - 1, idx):
+      if 0 <= seg < len(self.forward_factors):
+        self.forward_factors[seg] = (self.log_factors[seg + 1] - self.log_factors[seg]) \
+                                    / (self.maturities[seg + 1] - self.maturities[seg])
+
+    self.version += 1
+
   def __find_nearest__(self,
                        value : float,
                        array : np.ndarray):
@@ -241,7 +868,100 @@ class FlatForward:
     """
     maturities = maturities if isinstance(maturities, (list, np.ndarray)) else np.array([maturities])
 
-    return np.array(list(map(self.__interpolation__, maturities)))
+    return self.__interpolate_array__(np.asarray(maturities, dtype = float))
+
+  def __log_factors__(self,
+                      maturities : np.ndarray) -> np.ndarray:
+
+    """
+    Vectorized flat forward rule in log discount factor space, for all the provided maturities at once
+
+      - inside the curve, the log factor is linear between the two closest vertices
+      - above the last vertex, the last forward is extended (same as __extrapolation__)
+      - below the first vertex, the first yield is kept flat (same as __interpolation__)
+    """
+
+    mats = self.maturities
+    lfs  = self.log_factors
+
+    below = maturities < mats[0]
+    above = maturities > mats[-1]
+
+    if not self.extrapolate and (below.any() or above.any()):
+      raise ValueError(f'Error, this maturity ({maturities[below | above][0]}) cannot be interpolated while extrapolate = False')
+
+    if len(mats) == 1:
+      return maturities / self.days_year * np.log1p(float(self.yields[0]))
+
+    # Index of the left vertex of each segment, above the curve the last segment is used
+    idx = np.clip(np.searchsorted(mats, maturities, side = 'left'), 1, len(mats) - 1) - 1
+
+    log_factors = lfs[idx] + self.forward_factors[idx] * (maturities - mats[idx])
+
+    return np.where(below, maturities / self.days_year * np.log1p(float(self.yields[0])), log_factors)
+
+  def interpolation_weights(self,
+                            maturities : np.ndarray) -> tuple:
+
+    """
+    Linear weights of the flat forward rule: log_factor(t) = w_left * log_factors[left] + w_right * log_factors[right]
+
+      - the weights only depend on the vertex maturities, so they are reused for any yields on the same vertices
+        (shocked or bumped curves), while __log_factors__ is recomputed for every new set of yields
+      - below the first vertex (and on single vertex curves) the first log factor is scaled by t/first maturity
+    """
+
+    maturities = np.asarray(maturities, dtype = float)
+    mats = self.maturities
+
+    if not self.extrapolate and ((maturities < mats[0]).any() or (maturities > mats[-1]).any()):
+      raise ValueError(f'Error, this maturity ({maturities[(maturities < mats[0]) | (maturities > mats[-1])][0]}) cannot be interpolated while extrapolate = False')
+
+    if len(mats) == 1:
+      zeros = np.zeros(maturities.shape, dtype = np.int64)
+      return zeros, zeros, maturities / mats[0], np.zeros(maturities.shape)
+
+    left    = np.clip(np.searchsorted(mats, maturities, side = 'left'), 1, len(mats) - 1) - 1
+    w_right = (maturities - mats[left]) / (mats[left + 1] - mats[left])
+    w_left  = 1. - w_right
+
+    below   = maturities < mats[0]
+    w_left  = np.where(below, maturities / mats[0], w_left)
+    w_right = np.where(below, 0., w_right)
+
+    return left, left + 1, w_left, w_right
+
+  def discount_factors(self,
+                       maturities : np.ndarray,
+                       spread     : Union[float, np.ndarray] = 0.) -> np.ndarray:
+
+    """
+    Discount factors for the provided maturities, straight from the interpolated log discount factors
+    - with a spread, the spread is added to the interpolated yields (see YieldCurve.discount_factors)
+    """
+
+    if np.any(spread): return super().discount_factors(maturities, spread)
+
+    return np.exp(-self.__log_factors__(np.asarray(maturities, dtype = float)))
+
+  def __interpolate_array__(self,
+                            maturities : np.ndarray) -> np.ndarray:
+
+    """
+    Array version of __interpolation__, one searchsorted for every maturity and exact vertex hits returning the vertex yield
+    """
+
+    log_factors = self.__log_factors__(maturities)
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+      rates = np.expm1(log_factors * self.days_year / maturities)
+
+    # Exact vertex hits and maturities below the curve return the provided yields
+    pos = np.clip(np.searchsorted(self.maturities, maturities, side = 'left'), 0, len(self.maturities) - 1)
+    rates = np.where(self.maturities[pos] == maturities, self.yields[pos], rates)
+    rates = np.where(maturities < self.maturities[0], self.yields[0], rates)
+
+    return rates.astype(float)
 
   def __len__(self):
     return len(self.maturities)
@@ -251,3 +971,162 @@ class FlatForward:
 
   def __repr__(self):
     return self.__str__()
+
+
+class CurvePanel:
+
+  """
+  Panel of Flat Forward curves for many dates
+  - The vertices of every date are stored in padded 2-D arrays (dates x vertices) with per-date lengths
+  - A whole (dates x maturities) grid is interpolated in one vectorized call, with the same rule as FlatForward
+  """
+
+  def __init__(self,
+               dates       : np.ndarray,
+               maturities  : Union[list, np.ndarray],
+               yields      : Union[list, np.ndarray],
+               days_year   : int  = 252,
+               extrapolate : bool = False):
+
+    """
+    Variables:
+      - dates       : np.ndarray, dates of each curve
+      - maturities  : list of arrays (one per date) or 2-D np.ndarray padded with np.nan, maturities in days
+      - yields      : list of arrays (one per date) or 2-D np.ndarray padded with np.nan
+      - days_year   : int, days in a year, provided for the interpolation
+      - extrapolate : bool, if True, it will extrapolate the Yield Curves
+    """
+
+    assert len(dates) == len(maturities) == len(yields), \
+      f'Dates have len ({len(dates)}) while maturities have len ({len(maturities)}) and yields have len ({len(yields)})'
+
+    if isinstance(maturities, np.ndarray) and maturities.ndim == 2:
+      maturities = [row[~np.isnan(row)] for row in maturities.astype(float)]
+      yields     = [row[~np.isnan(row)] for row in np.asarray(yields, dtype = float)]
+
+    self.dates       = np.asarray(dates, dtype = 'datetime64[D]')
+    self.lengths     = np.array([len(m) for m in maturities], dtype = np.int64)
+    self.days_year   = days_year
+    self.extrapolate = extrapolate
+
+    assert (self.lengths == np.array([len(y) for y in yields])).all(), 'Maturities and yields must have the same len for every date'
+    assert (self.lengths > 0).all(), 'Every date must have at least one vertex'
+
+    # Padded arrays : maturities are padded with +inf so that padding never counts as a vertex below a maturity
+    width           = self.lengths.max()
+    self.maturities = np.full((len(self.dates), width), np.inf)
+    self.yields     = np.full((len(self.dates), width), np.nan)
+
+    for i, (m, y) in enumerate(zip(maturities, yields)):
+      self.maturities[i, : len(m)] = m
+      self.yields[i, : len(y)]     = y
+
+    with np.errstate(invalid = 'ignore'):
+      self.log_factors     = self.maturities / self.days_year * np.log1p(self.yields)
+      self.forward_factors = np.diff(self.log_factors, axis = 1) / np.diff(self.maturities, axis = 1)
+
+  @classmethod
+  def from_curves(cls,
+                  dates  : np.ndarray,
+                  curves : list):
+
+    """
+    Builds the panel from a list of FlatForward objects (one per date)
+    """
+
+    return cls(dates,
+               [c.maturities for c in curves],
+               [c.yields for c in curves],
+               days_year   = curves[0].days_year,
+               extrapolate = curves[0].extrapolate)
+
+  def __rows__(self,
+               dates) -> np.ndarray:
+
+    """
+    Rows of the panel for the requested dates (every date by default)
+    """
+
+    if dates is None: return np.arange(len(self.dates))
+
+    dates = np.atleast_1d(np.asarray(dates, dtype = 'datetime64[D]'))
+    order = np.argsort(self.dates, kind = 'stable')
+    rows  = order[np.minimum(np.searchsorted(self.dates[order], dates), len(self.dates) - 1)]
+
+    if not (self.dates[rows] == dates).all():
+      raise KeyError(f'Dates {dates[self.dates[rows] != dates]} are not in the panel')
+
+    return rows
+
+  def __call__(self,
+               maturities : np.ndarray,
+               dates      : Union[np.ndarray, None] = None,
+               chunk_size : int = 4_000_000) -> np.ndarray:
+
+    """
+    Interpolates a (dates x maturities) grid
+
+      - maturities : 1-D array (same maturities for every date) or 2-D array (dates x maturities)
+      - dates      : optional subset of the panel dates, every date by default
+      - chunk_size : max number of (date, vertex, maturity) comparisons held in memory at once
+    """
+
+    rows = self.__rows__(dates)
+    t    = np.asarray(maturities, dtype = float)
+    t    = np.broadcast_to(t, (len(rows), t.shape[-1]) if t.ndim else (len(rows), 1))
+
+    mats, lens = self.maturities[rows], self.lengths[rows][:, None]
+
+    below = t < mats[:, :1]
+    above = t > np.take_along_axis(mats, lens - 1, axis = 1)
+
+    if not self.extrapolate and (below.any() or above.any()):
+      raise ValueError(f'Error, this maturity ({t[below | above][0]}) cannot be interpolated while extrapolate = False')
+
+    # Number of vertices strictly below each maturity (row-wise searchsorted), computed in chunks of dates
+    step  = max(1, chunk_size // max(1, mats.shape[1] * t.shape[1]))
+    count = np.concatenate([(mats[i : i + step, :, None] < t[i : i + step, None, :]).sum(axis = 1)
+                            for i in range(0, len(rows), step)]) if len(rows) else np.zeros(t.shape, dtype = np.int64)
+
+    # Left vertex of the segment used by each maturity, above the curve the last segment is used
+    idx  = np.clip(count, 1, np.maximum(lens - 1, 1)) - 1
+    lfs  = self.log_factors[rows]
+    fwds = self.forward_factors[rows] if self.forward_factors.shape[1] else np.zeros((len(rows), 1))
+
+    log_factors = np.take_along_axis(lfs, idx, axis = 1) \
+                  + np.take_along_axis(fwds, idx, axis = 1) * (t - np.take_along_axis(mats, idx, axis = 1))
+
+    first_yield = self.yields[rows, :1]
+    flat        = below | (lens == 1)
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+      rates = np.expm1(np.where(flat, t / self.days_year * np.log1p(first_yield), log_factors) * self.days_year / t)
+
+    # Exact vertex hits and maturities below the curves return the provided yields
+    pos   = np.minimum(count, lens - 1)
+    rates = np.where(np.take_along_axis(mats, pos, axis = 1) == t, np.take_along_axis(self.yields[rows], pos, axis = 1), rates)
+    rates = np.where(below, first_yield, rates)
+
+    return rates
+
+  def __getitem__(self,
+                  date) -> FlatForward:
+
+    """
+    FlatForward of a single date of the panel
+    """
+
+    row = self.__rows__(date)[0]
+    n   = self.lengths[row]
+
+    return FlatForward(self.maturities[row, :n], self.yields[row, :n],
+                       days_year = self.days_year, extrapolate = self.extrapolate)
+
+  def __len__(self):
+    return len(self.dates)
+
+  def __str__(self):
+    return f'CurvePanel(dates = {len(self.dates)}, max_vertices = {self.maturities.shape[1]}, days_year = {self.days_year}, extrapolate = {self.extrapolate})'
+
+  def __repr__(self):
+    return self.__str__()
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""
+Author : Milton Rocha
+Medium : https://medium.com/@milton-rocha
+"""
+
+import numpy as np
+import os
+
+from typing import Iterator, Union
+
+from calc_utils import YieldCurve
+from date_utils import (BusinessCalendar,
+                        as_calendar)
+from pricer     import (RISK_BUCKETS,
+                        BondPortfolio)
+
+
+# Colunas do arquivo de posições, as opcionais utilizam os defaults do BondPortfolio
+POSITION_COLUMNS = {'obrigatorias' : ('instrument', 'maturity', 'yield'),
+                    'opcionais'    : ('id', 'val_date', 'VNA', 'quantity',
+                                      'annual_coupon', 'coupon_frequency', 'face_value', 'risk_type')}
+
+_ARROW_EXT = ('.arrow', '.feather', '.ipc')
+
+def _pyarrow():
+
+    """
+    Importação de pyarrow somente no uso (dependência opcional)
+    """
+
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        import pyarrow.ipc as ipc
+    except ImportError as e:
+        raise ImportError('columnar_io requer pyarrow (pip install pyarrow)') from e
+
+    return pa, pq, ipc
+
+def _to_numpy(coluna) -> np.ndarray:
+
+    """
+    Coluna Arrow para np.ndarray sem objetos Python por linha
+
+        - texto: codificado em dicionário, somente os valores distintos passam por Python
+        - datas e timestamps: datetime64[D]
+        - numéricas: conversão direta (sem cópia quando possível)
+    """
+
+    pa, _, _ = _pyarrow()
+
+    if isinstance(coluna, pa.ChunkedArray): coluna = coluna.combine_chunks()
+
+    tipo = coluna.type
+
+    if pa.types.is_string(tipo) or pa.types.is_large_string(tipo):
+        coluna = coluna.dictionary_encode()
+
+    if pa.types.is_dictionary(coluna.type):
+        valores = np.asarray(coluna.dictionary.to_pylist(), dtype = str)
+        return valores[coluna.indices.to_numpy(zero_copy_only = False)] if len(valores) else np.array([], dtype = str)
+
+    if pa.types.is_timestamp(tipo) or pa.types.is_date(tipo):
+        return coluna.cast(pa.date32()).to_numpy(zero_copy_only = False).astype('datetime64[D]')
+
+    return coluna.to_numpy(zero_copy_only = False)
+
+def _rebatch(lotes,
+             batch_size : int) -> Iterator:
+
+    """
+    Reagrupa lotes Arrow (RecordBatch/Table) em tabelas de exatamente batch_size linhas (o último pode ser menor)
+    """
+
+    pa, _, _ = _pyarrow()
+
+    pendentes, n = [], 0
+
+    for lote in lotes:
+        inicio = 0
+        while inicio < lote.num_rows:
+            parte = lote.slice(inicio, batch_size - n)
+            pendentes.append(parte)
+            n      += parte.num_rows
+            inicio += parte.num_rows
+            if n == batch_size:
+                yield pa.Table.from_batches(pendentes)
+                pendentes, n = [], 0
+
+    if n: yield pa.Table.from_batches(pendentes)
+
+def iter_positions(path       : str,
+                   columns    : Union[list, None] = None,
+                   batch_size : Union[int, None] = None) -> Iterator[dict]:
+
+    """
+    Leitura em fluxo de um arquivo de posições (.parquet ou Arrow IPC .arrow/.feather)
+
+        Cada item é um dict {coluna : np.ndarray} de um row group (ou de um
+    lote de batch_size linhas), de forma que a memória utilizada é limitada
+    pelo tamanho do lote e não pelo tamanho do arquivo
+
+    Variáveis:
+        path       : arquivo de posições, colunas conforme POSITION_COLUMNS
+        columns    : colunas a serem lidas, default = todas as colunas conhecidas presentes no arquivo
+        batch_size : número de linhas por lote, default = um lote por row group (parquet)
+                     ou por record batch (Arrow IPC)
+
+    Valores nulos em qualquer coluna lida retornam ValueError com a coluna e a linha
+    """
+
+    _, pq, ipc = _pyarrow()
+
+    if path.lower().endswith(_ARROW_EXT):
+        leitor  = ipc.open_file(path)
+        nomes   = leitor.schema.names
+        lotes   = (leitor.get_batch(i) for i in range(leitor.num_record_batches))
+    else:
+        arquivo = pq.ParquetFile(path)
+        nomes   = arquivo.schema_arrow.names
+        lotes   = None
+
+    conhecidas = POSITION_COLUMNS['obrigatorias'] + POSITION_COLUMNS['opcionais']
+    columns    = [c for c in (columns or conhecidas) if c in nomes]
+
+    faltantes = [c for c in POSITION_COLUMNS['obrigatorias'] if c not in columns]
+    if faltantes: raise KeyError(f'Colunas obrigatórias ausentes no arquivo de posições: {faltantes}')
+
+    if lotes is None:
+        lotes = arquivo.iter_batches(batch_size = batch_size, columns = columns) if batch_size else \
+                (arquivo.read_row_group(i, columns = columns) for i in range(arquivo.num_row_groups))
+    elif batch_size:
+        lotes = _rebatch((lote.select(columns) for lote in lotes), batch_size)
+
+    linha = 0
+
+    for lote in lotes:
+        if not lote.num_rows: continue
+
+        for c in columns:
+            coluna = lote.column(c)
+            if coluna.null_count:
+                nulos = np.flatnonzero(_to_numpy(coluna.is_null()))
+                raise ValueError(f'Coluna {c!r} possui valores nulos (linha {linha + int(nulos[0])} do arquivo)')
+
+        yield {c : _to_numpy(lote.column(c)) for c in columns}
+        linha += lote.num_rows
+
+def price_batch(positions    : dict,
+                val_date     : Union[str, np.datetime64, None] = None,
+                holidays     : Union[BusinessCalendar, list, np.ndarray, None] = None,
+                yield_curve  : Union[YieldCurve, None] = None,
+                risk_buckets : Union[dict, None] = None) -> tuple:
+
+    """
+    Precifica um lote de posições (saída de iter_positions) com um BondPortfolio por data de precificação
+
+    Retorna (resultados, krdv01), dicts {coluna : np.ndarray} na ordem das linhas do lote
+    """
+
+    n = len(positions['maturity'])
+
+    if 'val_date' in positions:
+        datas = positions['val_date'].astype('datetime64[D]')
+    elif val_date is not None:
+        datas = np.full(n, np.datetime64(val_date, 'D'))
+    else:
+        raise KeyError('Forneça val_date ou uma coluna val_date no arquivo de posições')
+
+    risk_buckets = risk_buckets if risk_buckets else RISK_BUCKETS
+    buckets      = sorted(risk_buckets, key = risk_buckets.get)
+    kwargs       = {p : positions[p] for p in ('annual_coupon', 'coupon_frequency', 'face_value', 'risk_type') if p in positions}
+
+    campos = ('price', 'duration', 'mod_duration', 'dv01', 'convexity', 'portfolio_value', 'portfolio_dv01')
+    saida  = {c : np.empty(n) for c in campos}
+    krdv01 = np.empty((n, len(buckets)))
+
+    unicas, grupo = np.unique(datas, return_inverse = True)
+
+    for g, data in enumerate(unicas):
+
+        linhas = np.flatnonzero(grupo == g) if len(unicas) > 1 else slice(None)
+
+        p = BondPortfolio(data,
+                          positions['instrument'][linhas],
+                          positions['maturity'][linhas],
+                          positions['yield'][linhas],
+                          VNA         = positions['VNA'][linhas] if 'VNA' in positions else 1.,
+                          quantity    = positions['quantity'][linhas] if 'quantity' in positions else 1.,
+                          holidays    = holidays,
+                          yield_curve = yield_curve,
+                          **{k : v[linhas] for k, v in kwargs.items()})
+
+        for c in campos: saida[c][linhas] = getattr(p, c)
+        krdv01[linhas] = p.krdv01(risk_buckets)
+
+    chaves = {c : positions[c] for c in ('id', 'instrument', 'maturity') if c in positions}
+    chaves['val_date'] = datas
+
+    resultados = {**chaves, 'yield' : positions['yield'], **saida}
+    krdv01     = {**{c : chaves[c] for c in ('id', 'instrument', 'maturity') if c in chaves},
+                  **{b : krdv01[:, j] for j, b in enumerate(buckets)}}
+
+    return resultados, krdv01
+
+class _ColumnarWriter:
+
+    """
+    Escrita incremental de lotes {coluna : np.ndarray} em .parquet (um row group por lote) ou Arrow IPC
+    """
+
+    def __init__(self,
+                 path : str):
+
+        self.path   = path
+        self.writer = None
+
+    def write(self,
+              colunas : dict):
+
+        pa, pq, ipc = _pyarrow()
+
+        tabela = pa.table({c : pa.array(v) for c, v in colunas.items()})
+
+        if self.writer is None:
+            if self.path.lower().endswith(_ARROW_EXT):
+                self.writer = ipc.new_file(self.path, tabela.schema)
+            else:
+                self.writer = pq.ParquetWriter(self.path, tabela.schema)
+
+        self.writer.write_table(tabela)
+
+    def close(self):
+        if self.writer is not None: self.writer.close()
+
+def price_file(positions_path : str,
+               results_path   : str,
+               krdv01_path    : Union[str, None] = None,
+               val_date       : Union[str, np.datetime64, None] = None,
+               holidays       : Union[BusinessCalendar, list, np.ndarray, None] = None,
+               yield_curve    : Union[YieldCurve, None] = None,
+               risk_buckets   : Union[dict, None] = None,
+               batch_size     : Union[int, None] = None) -> dict:
+
+    """
+    Precificação em fluxo de um arquivo de posições, escrevendo resultados e KRDV01 em arquivos colunares
+
+        Cada row group (ou lote de batch_size linhas) é lido, precificado pelo
+    BondPortfolio e escrito como um row group nos arquivos de saída, antes
+    do próximo lote ser lido, de forma que a memória é limitada pelo lote
+
+    Variáveis:
+        positions_path : arquivo de posições (.parquet ou .arrow/.feather), vide POSITION_COLUMNS
+        results_path   : arquivo de saída com preço e riscos por posição
+        krdv01_path    : arquivo de saída com o KRDV01 (x quantidade) por posição e bucket, default = não escreve
+        val_date       : data de precificação, caso o arquivo não tenha a coluna val_date
+
+    Retorna dict com o número de linhas e lotes e os totais do portfólio
+    """
+
+    calendar = as_calendar(holidays)
+    resumo   = {'rows' : 0, 'batches' : 0, 'Valor' : 0., 'DV01' : 0., 'KRDV01' : None}
+
+    escritores = [_ColumnarWriter(results_path)] + ([_ColumnarWriter(krdv01_path)] if krdv01_path else [])
+
+    try:
+        for lote in iter_positions(positions_path, batch_size = batch_size):
+
+            resultados, krdv01 = price_batch(lote, val_date, calendar, yield_curve, risk_buckets)
+
+            escritores[0].write(resultados)
+            if krdv01_path: escritores[1].write(krdv01)
+
+            buckets = {b : v.sum() for b, v in krdv01.items() if b not in ('id', 'instrument', 'maturity')}
+
+            resumo['rows']    += len(resultados['price'])
+            resumo['batches'] += 1
+            resumo['Valor']   += resultados['portfolio_value'].sum()
+            resumo['DV01']    += resultados['portfolio_dv01'].sum()
+            resumo['KRDV01']   = buckets if resumo['KRDV01'] is None else \
+                                 {b : resumo['KRDV01'][b] + v for b, v in buckets.items()}
+    except Exception:
+        for w in escritores: w.close()
+        for caminho in (results_path, krdv01_path):
+            if caminho and os.path.exists(caminho): os.remove(caminho)
+        raise
+
+    for w in escritores: w.close()
+
+    return resumo
@@ -7,6 +7,8 @@ Medium : https://medium.com/@milton-rocha
 import pandas as pd
 import numpy  as np
 import tempfile
+import hashlib
+import glob
 import os
 
 from datetime import datetime
@@ -26,20 +28,206 @@ def dt_fmt_old(date : str):
     """
     return datetime.strptime(date, '%Y-%m-%d')
 
+# Diretivas suportadas pelos parsers/formatadores vetorizados e seus tamanhos fixos
+_DIRETIVAS = {'%Y' : 4, '%m' : 2, '%d' : 2}
+
+def _layout_fmt(fmt : str) -> Union[list, None]:
+
+    """
+    Decompõe um formato de largura fixa em [(diretiva ou literal, posição, tamanho)]
+
+        Retorna None caso o formato possua diretivas que não são de largura
+    fixa (nesse caso, as funções vetorizadas usam o caminho genérico)
+    """
+
+    layout, i, pos = [], 0, 0
+    while i < len(fmt):
+        if fmt[i] == '%':
+            token = fmt[i : i + 2]
+            if token not in _DIRETIVAS: return None
+            layout.append((token, pos, _DIRETIVAS[token]))
+            pos += _DIRETIVAS[token]
+            i += 2
+        else:
+            layout.append((fmt[i], pos, 1))
+            pos += 1
+            i += 1
+
+    if not all(any(t == d for t, _, _ in layout) for d in _DIRETIVAS): return None
+    return layout
+
+def _dias_de_civil(ano   : np.ndarray,
+                   mes   : np.ndarray,
+                   dia   : np.ndarray) -> np.ndarray:
+
+    """
+    Dias desde 1970-01-01 para (ano, mês, dia) no calendário gregoriano, em aritmética inteira
+    """
+
+    ano = ano - (mes <= 2)
+    era = ano // 400
+    yoe = ano - era * 400
+    doy = (153 * ((mes + 9) % 12) + 2) // 5 + dia - 1
+    return era * 146097 + yoe * 365 + yoe // 4 - yoe // 100 + doy - 719468
+
+def _civil_de_dias(dias : np.ndarray) -> tuple:
+
+    """
+    Inverso de _dias_de_civil: (ano, mês, dia) para dias desde 1970-01-01
+    """
+
+    z   = dias + 719468
+    era = z // 146097
+    doe = z - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp  = (5 * doy + 2) // 153
+    dia = doy - (153 * mp + 2) // 5 + 1
+    mes = np.where(mp < 10, mp + 3, mp - 9)
+    return yoe + era * 400 + (mes <= 2), mes, dia
+
+_DIAS_MES = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31], dtype = np.int64)
+
+def parse_dates(dates : Union[str, list, np.ndarray, pd.Series],
+                fmt   : str = '%Y-%m-%d') -> np.ndarray:
+
+    """
+    Função que transforma um array de strings de data em np.ndarray 'datetime64[D]'
+
+        Para formatos de largura fixa compostos por %Y, %m e %d (ex.: '%Y-%m-%d',
+    '%d/%m/%Y', '%Y%m%d') os caracteres das strings são lidos diretamente da
+    memória do array e convertidos com aritmética inteira vetorizada, sem
+    criação de objetos Python por elemento
+
+    Variaveis:
+        dates : string, lista, np.ndarray ou pd.Series de datas
+        fmt   : formato das strings de data, default = '%Y-%m-%d'
+
+    Resposta:
+        np.ndarray : array de datas em 'datetime64[D]' (mesmo shape da entrada),
+                     valores nulos (None, NaN) resultam em NaT
+    """
+
+    arr = np.asarray(dates)
+    if np.issubdtype(arr.dtype, np.datetime64): return arr.astype('datetime64[D]')
+
+    # Nulos em arrays de objetos viram NaT, as demais datas seguem o caminho normal
+    if arr.dtype.kind == 'O':
+        nulos = pd.isna(arr)
+        if nulos.any():
+            ans = np.full(arr.shape, np.datetime64('NaT'), dtype = 'datetime64[D]')
+            ans[~nulos] = parse_dates(arr[~nulos], fmt)
+            return ans
+
+    layout = _layout_fmt(fmt)
+    width  = sum(n for _, _, n in layout) if layout else 0
+
+    if layout and arr.size and arr.dtype.kind in 'USO':
+        # Strings unicode são lidas diretamente como UCS4 (uint32) e bytes como uint8
+        raw = arr.astype('U') if arr.dtype.kind == 'O' else arr
+        char = np.uint8 if raw.dtype.kind == 'S' else np.uint32
+        n_chars = raw.dtype.itemsize // np.dtype(char).itemsize
+        mat = np.ascontiguousarray(raw).reshape(-1).view(char).reshape(-1, n_chars)
+
+        # Somente strings com exatamente width caracteres seguem pelo caminho vetorizado
+        if n_chars >= width and not (mat[:, width:].any() or (mat[:, :width] == 0).any()):
+            campos = {}
+            for token, pos, n in layout:
+                if token in _DIRETIVAS:
+                    # Subtração sem sinal: caracteres abaixo de '0' também resultam em valores > 9
+                    digitos = mat[:, pos : pos + n] - char(48)
+                    if (digitos > 9).any():
+                        raise ValueError(f'Datas fornecidas não estão no formato {fmt}')
+                    valor = np.zeros(len(mat), dtype = np.int64)
+                    for j in range(n): valor = valor * 10 + digitos[:, j]
+                    campos[token] = valor
+                elif (mat[:, pos] != ord(token)).any():
+                    raise ValueError(f'Datas fornecidas não estão no formato {fmt}')
+
+            ano, mes, dia = campos['%Y'], campos['%m'], campos['%d']
+            if ((mes < 1) | (mes > 12)).any():
+                raise ValueError(f'Datas fornecidas possuem mês inválido para o formato {fmt}')
+
+            bissexto = (ano % 4 == 0) & ((ano % 100 != 0) | (ano % 400 == 0))
+            if ((dia < 1) | (dia > _DIAS_MES[mes] + (bissexto & (mes == 2)))).any():
+                raise ValueError(f'Datas fornecidas possuem dia inválido para o formato {fmt}')
+
+            return _dias_de_civil(ano, mes, dia).astype('datetime64[D]').reshape(arr.shape)
+
+    # Caminho genérico: formato ISO é tratado pelo próprio numpy, demais formatos via strptime
+    if fmt == '%Y-%m-%d': return arr.astype('datetime64[D]')
+    f = np.vectorize(lambda dt: np.datetime64(datetime.strptime(dt, fmt), 'D'), otypes = ['datetime64[D]'])
+    return f(arr.astype(str))
+
+def format_dates(dates : Union[list, np.ndarray, pd.Series],
+                 fmt   : str = '%Y-%m-%d') -> np.ndarray:
+
+    """
+    Função que transforma um array de datas em np.ndarray de strings no formato fornecido
+
+        Formatos de largura fixa compostos por %Y, %m e %d são montados
+    diretamente em bytes, sem criação de objetos Python por elemento
+
+    Variaveis:
+        dates : datas em 'datetime64' ou strings 'yyyy-mm-dd'
+        fmt   : formato de saída, default = '%Y-%m-%d'
+
+    Resposta:
+        np.ndarray : array de strings (mesmo shape da entrada)
+    """
+
+    dates  = parse_dates(dates)
+    layout = _layout_fmt(fmt)
+    if not layout:
+        f = np.vectorize(lambda dt: dt.strftime(fmt), otypes = [str])
+        return f(dates.astype('datetime64[us]').astype(object))
+
+    ano, mes, dia = _civil_de_dias(dates.reshape(-1).astype(np.int64))
+    campos = {'%Y' : ano, '%m' : mes, '%d' : dia}
+
+    width = sum(n for _, _, n in layout)
+    b = np.empty((dates.size, width), dtype = np.uint8)
+    for token, pos, n in layout:
+        if token in _DIRETIVAS:
+            valor = campos[token]
+            for j in range(n - 1, -1, -1):
+                b[:, pos + j] = valor % 10 + 48
+                valor = valor // 10
+        else:
+            b[:, pos] = ord(token)
+
+    return b.view(f'S{width}').reshape(dates.shape).astype(f'U{width}')
+
+def _date_only(arr : np.ndarray) -> bool:
+
+    """
+    Indica se todas as datas são dias puros (datetime64 sem hora ou strings 'yyyy-mm-dd')
+    """
+
+    if arr.dtype.kind == 'M': return bool(np.all((arr.astype('datetime64[D]') == arr) | np.isnat(arr)))
+    return arr.dtype.kind == 'U' and bool(np.all(np.char.str_len(arr) == 10))
+
 # strptime equivalent with built-in 90x faster
 def isofmt(date : list) -> list:
     """
     Função que transforma mapeando uma série de datas fornecidas em formato de lista
     
     Variaveis:
-        date : lista de strings de data em formato "yyyy-mm-dd"
+        date : lista de strings de data em formato ISO ("yyyy-mm-dd", com ou sem hora)
         
     Resposta:
         list : lista de datas traduzida para datetime
         
     """
     if not isinstance(date, list): date = [date]
-    return list(map(datetime.fromisoformat, date))
+    
+    # Somente datas puras "yyyy-mm-dd" seguem pelo caminho vetorizado, strings
+    # com hora, fuso ou outros formatos mantêm a semântica de datetime.fromisoformat
+    arr = np.asarray(date)
+    if arr.dtype.kind != 'U' or not _date_only(arr):
+        return list(map(datetime.fromisoformat, date))
+    
+    return parse_dates(arr).astype('datetime64[us]').astype(object).tolist()
 
 
 def date_fmt_mapper(date : Union[list, np.ndarray],
@@ -48,14 +236,21 @@ def date_fmt_mapper(date : Union[list, np.ndarray],
     Função que transforma mapeando uma série de datas fornecidas em formato de lista
     
     Variaveis:
-        date : lista de strings de data em formato "yyyy-mm-dd"
+        date : lista de strings de data em formato ISO ("yyyy-mm-dd", com ou sem hora) ou datetime64
+        fmt  : formato de saída (strftime)
         
     Resposta:
-        list : lista de datas traduzida para datetime
+        list : lista de datas no formato fornecido
         
     """
-    f = lambda dt: dt.strftime(fmt)
-    return list(map(f, isofmt(date)))
+    if not isinstance(date, (list, np.ndarray)): date = [date]
+    
+    # Somente dias puros seguem pelo caminho vetorizado, datas com hora
+    # mantêm a semântica de datetime.fromisoformat + strftime
+    arr = np.asarray(date)
+    if _date_only(arr): return format_dates(arr, fmt).tolist()
+    
+    return [dt.strftime(fmt) for dt in isofmt([str(d) for d in arr.ravel()])]
 
 def edate(data          : Union[str, np.datetime64],
           meses         : int,
@@ -72,10 +267,15 @@ def edate(data          : Union[str, np.datetime64],
     # faster implementation:
     return np.datetime64('{}-{:02d}-{:02d}'.format(data.year, data.month, data.day), 'D')
 
-def feriados(override : bool = False) -> np.ndarray:
+def feriados(override : bool = False,
+             offline  : bool = False) -> np.ndarray:
 
     """
     Função que faz o download dos feriados do site da Anbima e os compila em um formato a ser utilizado
+
+    Variaveis:
+        override : caso True, não faz o download e lê o arquivo temporário
+        offline  : caso True, nunca acessa a rede, o arquivo temporário precisa existir
     
     Resposta:
       np.array(feriados, dtype = 'datetime64[D]')
@@ -85,6 +285,9 @@ def feriados(override : bool = False) -> np.ndarray:
     # O arquivo finaliza antes da linha que possui "Fonte: ANBIMA" como valor
     arq_temp = f'{tempfile.gettempdir()}/fer_anbima.parquet'
 
+    if offline and not os.path.isfile(arq_temp):
+        raise FileNotFoundError(f'Modo offline: o arquivo de feriados {arq_temp} não existe e o download não será feito')
+
     # Checa se já existe um arquivo de feriados Anbima gerado na pasta temporária, caso não, cria o arquivo
     if not os.path.isfile(arq_temp) and not override:
         feriados = pd.read_excel(r'https://www.anbima.com.br/feriados/arqs/feriados_nacionais.xls')
@@ -96,3 +299,371 @@ def feriados(override : bool = False) -> np.ndarray:
     
     # A função irá retornar um np.array contendo todas as datas de feriado disponíveis em formato 'datetime64[D]'
     return feriados.values.astype('datetime64[D]').flatten()
+
+
+class BusinessCalendar:
+
+    """
+        Calendário de dias úteis pré-calculado a partir de uma lista de feriados
+
+        O objeto é construído uma única vez e guarda um índice acumulado de dias
+    úteis para todo o intervalo [inicio, fim]. Contagens de dias úteis, rolagens
+    e deslocamentos passam a ser consultas vetorizadas nesse índice, em vez de
+    chamadas a np.busday_count/np.busday_offset contra o array de feriados
+
+    Variáveis:
+        holidays : list, np.ndarray ou pd.DataFrame contendo os feriados, default = HOLIDAY_STORE.load()
+        inicio   : primeira data coberta pelo índice
+        fim      : última data coberta pelo índice
+        weekmask : máscara de dias da semana considerados úteis (padrão numpy)
+
+    Datas fora do intervalo coberto são tratadas pelas funções do numpy, com o
+    mesmo np.busdaycalendar, de forma que o resultado é sempre o mesmo
+    """
+
+    def __init__(self,
+                 holidays : Union[list, np.ndarray, pd.DataFrame, None] = None,
+                 inicio   : Union[str, np.datetime64] = '1990-01-01',
+                 fim      : Union[str, np.datetime64] = '2100-12-31',
+                 weekmask : str = '1111100'):
+
+        holidays = HOLIDAY_STORE.load() if holidays is None else holidays
+
+        self.holidays  = np.unique(np.asarray(holidays).astype('datetime64[D]').ravel())
+        self.weekmask  = weekmask
+        self.busdaycal = np.busdaycalendar(weekmask = weekmask, holidays = self.holidays)
+        self.inicio    = np.datetime64(inicio, 'D')
+        self.fim       = np.datetime64(fim, 'D')
+
+        # is_bday[i] indica se (inicio + i) é dia útil
+        self.is_bday = np.is_busday(np.arange(self.inicio, self.fim + 1), busdaycal = self.busdaycal)
+
+        # cum[i] = quantidade de dias úteis em [inicio, inicio + i)
+        self.cum = np.zeros(len(self.is_bday) + 1, dtype = np.int64)
+        np.cumsum(self.is_bday, out = self.cum[1:])
+
+        # Posições (em dias a partir de inicio) de cada um dos dias úteis
+        self.bdays = np.flatnonzero(self.is_bday)
+
+        # Identidade do calendário, utilizada para comparar calendários
+        self.key = hash((self.weekmask, str(self.inicio), str(self.fim), self.holidays.tobytes()))
+
+    def __positions__(self,
+                      dates) -> np.ndarray:
+
+        """
+        Posição de cada data em dias corridos a partir do início do calendário
+        """
+
+        return (np.asarray(dates, dtype = 'datetime64[D]') - self.inicio).astype(np.int64)
+
+    def __in_range__(self,
+                     pos : np.ndarray) -> bool:
+
+        return pos.size == 0 or (pos.min() >= 0 and pos.max() < len(self.is_bday))
+
+    @staticmethod
+    def __output__(result : np.ndarray):
+
+        # Mantém o comportamento do numpy: entrada escalar retorna escalar
+        return result[()] if result.ndim == 0 else result
+
+    def is_busday(self,
+                  dates) -> Union[bool, np.ndarray]:
+
+        """
+        Equivalente a np.is_busday(dates, holidays = feriados)
+        """
+
+        pos = self.__positions__(dates)
+        if not self.__in_range__(pos):
+            return np.is_busday(np.asarray(dates, dtype = 'datetime64[D]'), busdaycal = self.busdaycal)
+
+        return self.__output__(self.is_bday[pos])
+
+    def busday_count(self,
+                     begindates,
+                     enddates) -> Union[int, np.ndarray]:
+
+        """
+        Equivalente a np.busday_count(begindates, enddates, holidays = feriados)
+
+            Conta os dias úteis no intervalo [begindates, enddates) ou, caso
+        enddates < begindates, conta (com sinal negativo) os dias úteis no
+        intervalo (enddates, begindates], assim como o numpy. Aceita
+        escalares ou arrays (com broadcast)
+        """
+
+        pos_ini = self.__positions__(begindates)
+        pos_fim = self.__positions__(enddates)
+
+        # Intervalo [a, b) no índice acumulado, deslocado em um dia para os pares invertidos
+        reverso = pos_fim < pos_ini
+        a = np.where(reverso, pos_fim + 1, pos_ini)
+        b = np.where(reverso, pos_ini + 1, pos_fim)
+
+        # O índice acumulado aceita fim = último dia + 1
+        if not (self.__in_range__(a) and self.__in_range__(b - 1)):
+            return np.busday_count(np.asarray(begindates, dtype = 'datetime64[D]'),
+                                   np.asarray(enddates, dtype = 'datetime64[D]'),
+                                   busdaycal = self.busdaycal)
+
+        return self.__output__(np.where(reverso, -1, 1) * (self.cum[b] - self.cum[a]))
+
+    def busday_offset(self,
+                      dates,
+                      offsets = 0,
+                      roll : str = 'raise') -> Union[np.datetime64, np.ndarray]:
+
+        """
+        Equivalente a np.busday_offset(dates, offsets, roll, holidays = feriados)
+
+            A data é primeiro rolada para um dia útil (de acordo com roll) e
+        então deslocada em offsets dias úteis. Rolagens aceitas: 'raise',
+        'forward'/'following' e 'backward'/'preceding'
+        """
+
+        pos     = self.__positions__(dates)
+        offsets = np.asarray(offsets, dtype = np.int64)
+
+        if not self.__in_range__(pos) or roll not in ('raise', 'forward', 'following', 'backward', 'preceding'):
+            return np.busday_offset(np.asarray(dates, dtype = 'datetime64[D]'), offsets,
+                                    roll = roll, busdaycal = self.busdaycal)
+
+        if roll == 'raise' and not np.all(self.is_bday[pos]):
+            raise ValueError('Não é possível rolar uma data que não é dia útil com roll = "raise"')
+
+        # Ranking do dia útil resultante da rolagem dentro de self.bdays
+        if roll in ('backward', 'preceding'):
+            rank = self.cum[pos + 1] - 1
+        else:
+            rank = self.cum[pos]
+        rank = rank + offsets
+
+        if rank.size and (rank.min() < 0 or rank.max() >= len(self.bdays)):
+            return np.busday_offset(np.asarray(dates, dtype = 'datetime64[D]'), offsets,
+                                    roll = roll, busdaycal = self.busdaycal)
+
+        return self.__output__(self.inicio + self.bdays[rank])
+
+    def roll(self,
+             dates,
+             roll : str = 'forward') -> Union[np.datetime64, np.ndarray]:
+
+        """
+        Rola as datas fornecidas para o dia útil mais próximo na direção de roll
+        """
+
+        return self.busday_offset(dates, 0, roll = roll)
+
+    def __copy__(self):
+        # O calendário é imutável, cópias compartilham o mesmo índice
+        return self
+
+    def __deepcopy__(self,
+                     memo : dict):
+        return self
+
+    def __reduce__(self):
+        # np.busdaycalendar não é serializável, o calendário é reconstruído a partir dos feriados
+        return (self.__class__, (self.holidays, self.inicio, self.fim, self.weekmask))
+
+    def __eq__(self,
+               other) -> bool:
+
+        return isinstance(other, BusinessCalendar) and self.key == other.key
+
+    def __hash__(self):
+        return self.key
+
+    def __len__(self):
+        return len(self.bdays)
+
+    def __str__(self):
+        return f'BusinessCalendar(inicio = {self.inicio}, fim = {self.fim}, feriados = {len(self.holidays)}, weekmask = {self.weekmask})'
+
+    def __repr__(self):
+        return self.__str__()
+
+
+# Calendários já construídos, indexados pelos feriados que os originaram
+_CALENDARIOS = {}
+
+def as_calendar(holidays : Union[BusinessCalendar, list, np.ndarray, pd.DataFrame, None] = None) -> BusinessCalendar:
+
+    """
+    Função que retorna um BusinessCalendar para os feriados fornecidos
+
+        Caso já seja um BusinessCalendar, é retornado sem alterações. Listas ou
+    arrays de feriados reutilizam o calendário já construído para os mesmos
+    feriados, de forma que o índice acumulado é calculado uma única vez. Caso
+    não sejam fornecidos feriados, retorna o calendário de HOLIDAY_STORE
+    """
+
+    if isinstance(holidays, BusinessCalendar): return holidays
+    if holidays is None: return HOLIDAY_STORE.calendar
+    chave = np.unique(np.asarray(holidays).astype('datetime64[D]').ravel()).tobytes()
+
+    if chave not in _CALENDARIOS:
+        _CALENDARIOS[chave] = BusinessCalendar(holidays)
+
+    return _CALENDARIOS[chave]
+
+
+# Diretório do pacote, os arquivos de feriados são resolvidos a partir dele (e não do diretório de trabalho)
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+class HolidayStore:
+
+    """
+        Armazenamento preguiçoso (lazy) dos feriados utilizados na precificação
+
+        Nada é lido na importação: no primeiro uso, os feriados são lidos de um
+    arquivo binário compacto 'datetime64[D]' (.npy), aberto via memory-map, de
+    forma que diversos processos compartilham as mesmas páginas do arquivo.
+    Caso o arquivo binário ainda não exista, ele é gerado uma única vez a partir
+    de holidays.parquet (na pasta do pacote) ou, em último caso, de feriados()
+
+        O nome do arquivo binário leva a assinatura (caminho, mtime e tamanho)
+    do .parquet de origem, de forma que uma alteração na origem gera um novo
+    arquivo em vez de reutilizar um calendário desatualizado
+
+    Variáveis:
+        path    : caminho base do arquivo binário, default = PACKAGE_DIR/holidays.npy
+                  (salvo como holidays-<assinatura>.npy)
+        source  : arquivo .parquet de origem, default = PACKAGE_DIR/holidays.parquet
+        offline : caso True, nunca acessa a rede (default = variável de ambiente
+                  RENDAFIXA_OFFLINE = 1)
+        mmap    : caso True, o arquivo binário é aberto via memory-map
+    """
+
+    def __init__(self,
+                 path    : Union[str, None] = None,
+                 source  : Union[str, None] = None,
+                 offline : Union[bool, None] = None,
+                 mmap    : bool = True):
+
+        self.path    = path if path is not None else os.path.join(PACKAGE_DIR, 'holidays.npy')
+        self.source  = source if source is not None else os.path.join(PACKAGE_DIR, 'holidays.parquet')
+        self.offline = offline if offline is not None else os.environ.get('RENDAFIXA_OFFLINE', '0') == '1'
+        self.mmap    = mmap
+
+        self._holidays = None
+        self._calendar = None
+
+    def __read_source__(self) -> np.ndarray:
+
+        """
+        Leitura dos feriados a partir do .parquet do pacote ou, caso não exista, de feriados()
+        """
+
+        if os.path.isfile(self.source):
+            return pd.read_parquet(self.source).values.astype('datetime64[D]').flatten()
+
+        return feriados(offline = self.offline)
+
+    def __signature__(self) -> str:
+
+        """
+        Assinatura do arquivo binário: caminhos, mtime e tamanho do .parquet de origem
+        (sem origem, os feriados vêm de feriados() e a assinatura depende somente dos caminhos)
+        """
+
+        chave = f'{os.path.abspath(self.path)}|{os.path.abspath(self.source)}'
+        if os.path.isfile(self.source):
+            st = os.stat(self.source)
+            chave += f'|{st.st_mtime_ns}|{st.st_size}'
+
+        return hashlib.sha1(chave.encode()).hexdigest()[:16]
+
+    def __paths__(self) -> tuple:
+
+        """
+        Caminhos do arquivo binário para a versão atual da origem: pasta de path e pasta temporária
+        (com prefixo do pacote, para não colidir com arquivos de outros programas)
+        """
+
+        raiz, ext = os.path.splitext(self.path)
+        nome = f'{os.path.basename(raiz)}-{self.__signature__()}{ext or ".npy"}'
+
+        return (os.path.join(os.path.dirname(raiz), nome),
+                os.path.join(tempfile.gettempdir(), f'rendafixa-{nome}'))
+
+    def __build__(self) -> str:
+
+        """
+        Gera o arquivo binário de feriados e retorna o caminho onde foi salvo
+
+            Caso a pasta do pacote não permita escrita, o arquivo é salvo na
+        pasta temporária. A escrita é feita em arquivo temporário seguido de
+        os.replace, para que outros processos nunca leiam um arquivo parcial.
+        Versões anteriores (outra assinatura) na pasta do pacote são removidas
+        """
+
+        hols = np.unique(self.__read_source__().astype('datetime64[D]'))
+        principal, temp = self.__paths__()
+
+        for path in (principal, temp):
+            try:
+                with tempfile.NamedTemporaryFile(dir = os.path.dirname(path), suffix = '.npy', delete = False) as f:
+                    np.save(f, hols)
+                os.replace(f.name, path)
+            except OSError:
+                continue
+
+            # Versões anteriores somente na pasta do pacote (a pasta temporária é compartilhada)
+            if path == principal:
+                raiz, ext = os.path.splitext(self.path)
+                for antigo in glob.glob(f'{raiz}-*{ext or ".npy"}'):
+                    if antigo != path:
+                        try:
+                            os.remove(antigo)
+                        except OSError:
+                            pass
+
+            return path
+
+        raise OSError(f'Não foi possível gravar o arquivo de feriados em {self.path}')
+
+    def load(self) -> np.ndarray:
+
+        """
+        Retorna os feriados como np.ndarray 'datetime64[D]' (somente leitura)
+        """
+
+        if self._holidays is None:
+
+            path = next((p for p in self.__paths__() if os.path.isfile(p)), None) or self.__build__()
+
+            self._holidays = np.load(path, mmap_mode = 'r' if self.mmap else None)
+
+        return self._holidays
+
+    @property
+    def calendar(self) -> BusinessCalendar:
+
+        """
+        BusinessCalendar construído, uma única vez, a partir dos feriados do armazenamento
+        """
+
+        if self._calendar is None: self._calendar = as_calendar(self.load())
+        return self._calendar
+
+    def refresh(self):
+
+        """
+        Descarta o arquivo binário e os dados carregados, que serão regerados no próximo uso
+        """
+
+        for path in self.__paths__():
+            if os.path.isfile(path): os.remove(path)
+        self._holidays, self._calendar = None, None
+
+    def __str__(self):
+        return f'HolidayStore(path = {self.path}, offline = {self.offline}, loaded = {self._holidays is not None})'
+
+    def __repr__(self):
+        return self.__str__()
+
+
+HOLIDAY_STORE = HolidayStore()
@@ -1,4 +1,4 @@
-from pricer import Bond, BondSolver
+from pricer import Bond, BondSolver, LTN, NTNF, NTNB, RiskAggregator
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
@@ -29,20 +29,10 @@ ax.tick_params(axis = 'y', which = 'major', labelsize = 14)
 ltn  = LTN('2022-07-29', '2026-01-01', 0.127492, quantity = 132835, bucketting = True)
 ntnf = NTNF('2022-07-29', '2033-01-01', 0.129348, quantity = 98475, bucketting = True)
 ntnb = NTNB('2022-07-29', '2045-05-15', 0.062480, VNA, quantity = 15684, bucketting = True)
-# Buckets são estruturados e calculados
-ltn_buck  = ltn.structured_buckets()
-ntnf_buck = ntnf.structured_buckets()
-ntnb_buck = ntnb.structured_buckets()
-# Empilhamento de todas as bases em somente uma
-total = ltn_buck.append(ntnf_buck).append(ntnb_buck).copy()
-# Pivot table nada mais será do que uma sumarização dos valores já presentes no total (todos os buckets agrupados)
-# Visto que a tag de RiskType está presente na coluna de mesmo nome, os valores serão agrupados em colunas representativas
-# RiskType da carteira ['Nominal', 'Real']
-pivot = pd.pivot_table(total,
-                       index = [total.index, 'du'],
-                       columns = 'RiskType',
-                       values = 'KRDV01',
-                       aggfunc = np.sum).sort_values('du').droplevel(1, axis = 0)
+# Os KRDV01 de todos os títulos são acumulados por RiskType e bucket em uma única matriz
+# O DataFrame é construído somente no final, com os buckets no índice e os RiskTypes da carteira
+# ['Nominal', 'Real'] nas colunas (RiskTypes sem exposição não aparecem)
+pivot = RiskAggregator().extend([ltn, ntnf, ntnb]).to_frame()
 
 # Construção do gráfico
 fig, ax = plt.subplots()
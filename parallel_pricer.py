@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""
+Author : Milton Rocha
+Medium : https://medium.com/@milton-rocha
+"""
+
+import multiprocessing as mp
+import numpy as np
+import os
+
+from multiprocessing import shared_memory
+from typing          import Union
+
+from calc_utils import (FlatForward,
+                        YieldCurve,
+                        coupon_count_bound)
+from date_utils import (BusinessCalendar,
+                        as_calendar,
+                        parse_dates)
+from pricer     import (RISK_BUCKETS,
+                        BondPortfolio,
+                        position_params)
+
+
+class SharedArrays:
+
+    """
+        Conjunto de arrays numpy publicados uma única vez em
+    multiprocessing.shared_memory, os processos acessam os mesmos buffers pelo
+    nome (spec) sem que os arrays sejam serializados a cada tarefa
+
+    Variáveis:
+        arrays : dict {nome : np.ndarray}
+
+    """
+
+    def __init__(self,
+                 arrays : dict):
+
+        self.__blocks = []
+        self.spec     = {}
+        self.arrays   = {}
+
+        for nome, arr in arrays.items():
+            arr = np.ascontiguousarray(arr)
+            shm = shared_memory.SharedMemory(create = True, size = max(arr.nbytes, 1))
+
+            view = np.ndarray(arr.shape, dtype = arr.dtype, buffer = shm.buf)
+            view[...] = arr
+
+            self.__blocks.append(shm)
+            self.spec[nome]   = (shm.name, arr.shape, arr.dtype.str)
+            self.arrays[nome] = view
+
+    @staticmethod
+    def attach(spec : dict) -> tuple:
+
+        """
+        Acessa (somente leitura) os arrays publicados, retorna ({nome : np.ndarray}, blocos de memória)
+        """
+
+        arrays, blocks = {}, []
+
+        for nome, (shm_name, shape, dtype) in spec.items():
+
+            #   O processo que acessa não é dono da memória (track = False, python >= 3.13),
+            # nas versões anteriores o registro é feito no mesmo resource_tracker do processo
+            # principal (processos do pool), que remove a memória somente uma vez em close()
+            try:
+                shm = shared_memory.SharedMemory(name = shm_name, track = False)
+            except TypeError:
+                shm = shared_memory.SharedMemory(name = shm_name)
+
+            arr = np.ndarray(shape, dtype = np.dtype(dtype), buffer = shm.buf)
+            arr.flags.writeable = False
+
+            arrays[nome] = arr
+            blocks.append(shm)
+
+        return arrays, blocks
+
+    def close(self):
+
+        """
+        Libera e remove a memória compartilhada
+        """
+
+        self.arrays = {}
+
+        for shm in self.__blocks:
+            shm.close()
+            shm.unlink()
+
+        self.__blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# Estado de cada processo do pool, preenchido uma única vez por _init_worker
+_WORKER = {}
+
+def _init_worker(spec : dict,
+                 meta : dict):
+
+    """
+    Inicializador dos processos: acessa os arrays compartilhados e reconstrói calendário e curva
+    """
+
+    arrays, blocks = SharedArrays.attach(spec)
+
+    curva = meta['yield_curve']
+    if curva is None and 'curve_maturities' in arrays:
+        curva = FlatForward(arrays['curve_maturities'], arrays['curve_yields'],
+                            days_year = meta['days_year'], extrapolate = meta['extrapolate'])
+
+    _WORKER.update(arrays      = arrays,
+                   blocks      = blocks,
+                   calendar    = as_calendar(arrays['holidays']),
+                   yield_curve = curva,
+                   meta        = meta)
+
+def _price_shard(shard : tuple) -> dict:
+
+    """
+        Precificação e riscos das posições [inicio : fim] com um BondPortfolio,
+    o CashflowTable da fatia é construído no próprio processo a partir dos
+    vencimentos compartilhados (não rolados)
+    """
+
+    inicio, fim = shard
+    a, m = _WORKER['arrays'], _WORKER['meta']
+
+    portfolio = BondPortfolio(m['val_date'],
+                              a['instruments'][inicio : fim],
+                              a['vencimentos'][inicio : fim],
+                              a['yields'][inicio : fim],
+                              VNA              = a['VNA'][inicio : fim],
+                              quantity         = a['quantity'][inicio : fim],
+                              holidays         = _WORKER['calendar'],
+                              yield_curve      = _WORKER['yield_curve'],
+                              spread           = a['spread'][inicio : fim],
+                              annual_coupon    = a['annual_coupon'][inicio : fim],
+                              coupon_frequency = a['coupon_frequency'][inicio : fim],
+                              face_value       = a['face_value'][inicio : fim],
+                              risk_type        = a['risk_type'][inicio : fim])
+
+    return {'shard'        : shard,
+            'price'        : portfolio.price,
+            'duration'     : portfolio.duration,
+            'mod_duration' : portfolio.mod_duration,
+            'dv01'         : portfolio.dv01,
+            'convexity'    : portfolio.convexity,
+            'krdv01'       : portfolio.krdv01(m['risk_buckets'])}
+
+
+class ParallelPricer:
+
+    """
+        Precificação de portfólios de títulos (mesmos parâmetros do
+    BondPortfolio) dividida em fatias de posições entre os processos de um pool
+
+        Feriados, curva (FlatForward) e os parâmetros das posições são
+    publicados uma única vez em memória compartilhada (SharedArrays), cada
+    tarefa recebe somente o intervalo [inicio : fim] das suas posições e
+    constrói o CashflowTable da sua fatia, de forma que a geração dos fluxos
+    (a etapa mais cara) também é paralelizada. As fatias são contíguas e
+    balanceadas pelo limite de fluxos de cada posição (coupon_count_bound,
+    sem gerar as datas), e os resultados são concatenados na ordem das
+    fatias, de forma que o resultado não depende da ordem de término das
+    tarefas nem do número de processos
+
+    Variáveis:
+        n_workers : número de processos, default = os.cpu_count()
+        n_shards  : número de fatias, default = 4 fatias por processo
+
+    """
+
+    def __init__(self,
+                 n_workers : Union[int, None] = None,
+                 n_shards  : Union[int, None] = None):
+
+        self.n_workers = n_workers if n_workers else (os.cpu_count() or 1)
+        self.n_shards  = n_shards if n_shards else 4 * self.n_workers
+
+    @staticmethod
+    def shards(offsets  : np.ndarray,
+               n_shards : int) -> list:
+
+        """
+        Intervalos contíguos de posições [inicio, fim) com aproximadamente o mesmo número de fluxos
+        """
+
+        n = len(offsets) - 1
+        if n <= 0: return []
+
+        alvos  = np.linspace(0, offsets[-1], min(n_shards, n) + 1)[1:-1]
+        cortes = np.unique(np.concatenate([[0], np.searchsorted(offsets, alvos, side = 'left'), [n]]))
+
+        return [(int(i), int(f)) for i, f in zip(cortes[:-1], cortes[1:]) if f > i]
+
+    def __call__(self,
+                 val_date     : Union[str, np.datetime64],
+                 instruments  : Union[str, list, np.ndarray],
+                 maturities   : Union[list, np.ndarray],
+                 yields       : Union[float, list, np.ndarray],
+                 VNA          : Union[float, list, np.ndarray] = 1.,
+                 quantity     : Union[float, list, np.ndarray] = 1.,
+                 holidays     : Union[BusinessCalendar, list, np.ndarray, None] = None,
+                 yield_curve  : Union[YieldCurve, None] = None,
+                 spread       : Union[float, list, np.ndarray] = 0.,
+                 risk_buckets : Union[dict, None] = None,
+                 **kwargs) -> dict:
+
+        """
+        Precifica o portfólio, mesmos argumentos (e **kwargs) do BondPortfolio
+
+        Retorna dict com arrays por posição (price, duration, mod_duration,
+        dv01, convexity, portfolio_value, portfolio_dv01), a matriz krdv01
+        (posições x buckets), buckets e as medidas agregadas do portfólio
+        """
+
+        calendar    = as_calendar(holidays)
+        vencimentos = np.atleast_1d(parse_dates(maturities))
+        n = len(vencimentos)
+
+        instruments = np.broadcast_to(np.asarray(instruments, dtype = str), (n,))
+
+        # Parâmetros por posição, conforme BondPortfolio
+        params = position_params(instruments, n, **kwargs)
+
+        # Fluxos (limite superior) acumulados por posição, somente para o balanceamento das fatias
+        offsets = np.zeros(n + 1, dtype = np.int64)
+        np.cumsum(coupon_count_bound(vencimentos, params['coupon_frequency'], val_date), out = offsets[1:])
+
+        arrays = {'holidays'         : calendar.holidays,
+                  'vencimentos'      : vencimentos,
+                  'instruments'      : instruments,
+                  'yields'           : np.broadcast_to(np.asarray(yields, dtype = float), (n,)),
+                  'VNA'              : np.broadcast_to(np.asarray(VNA, dtype = float), (n,)),
+                  'quantity'         : np.broadcast_to(np.asarray(quantity, dtype = float), (n,)),
+                  'spread'           : np.broadcast_to(np.asarray(spread, dtype = float), (n,)),
+                  'annual_coupon'    : params['annual_coupon'].astype(float),
+                  'coupon_frequency' : params['coupon_frequency'].astype(np.int64),
+                  'face_value'       : params['face_value'].astype(float),
+                  'risk_type'        : params['risk_type'].astype(str)}
+
+        # FlatForward publicada pelos vértices, outras curvas (pequenas) seguem no inicializador
+        meta = {'val_date'     : np.datetime64(val_date, 'D'),
+                'risk_buckets' : risk_buckets if risk_buckets else RISK_BUCKETS,
+                'yield_curve'  : None if isinstance(yield_curve, FlatForward) else yield_curve}
+
+        if isinstance(yield_curve, FlatForward):
+            arrays.update(curve_maturities = yield_curve.maturities, curve_yields = yield_curve.yields)
+            meta.update(days_year = yield_curve.days_year, extrapolate = yield_curve.extrapolate)
+
+        shards = self.shards(offsets, self.n_shards)
+
+        with SharedArrays(arrays) as shared:
+
+            if self.n_workers == 1 or len(shards) <= 1:
+                _init_worker(shared.spec, meta)
+                try:
+                    resultados = [_price_shard(s) for s in shards]
+                finally:
+                    for shm in _WORKER.pop('blocks', []): shm.close()
+                    _WORKER.clear()
+            else:
+                with mp.Pool(min(self.n_workers, len(shards)), initializer = _init_worker, initargs = (shared.spec, meta)) as pool:
+                    resultados = pool.map(_price_shard, shards, chunksize = 1)
+
+        # Merge determinístico, na ordem das fatias
+        resultados.sort(key = lambda r: r['shard'])
+
+        nomes  = sorted(meta['risk_buckets'], key = meta['risk_buckets'].get)
+        ans = {campo : np.concatenate([r[campo] for r in resultados]) if resultados else np.array([])
+               for campo in ('price', 'duration', 'mod_duration', 'dv01', 'convexity')}
+        ans['krdv01'] = np.concatenate([r['krdv01'] for r in resultados]) if resultados else np.zeros((0, len(nomes)))
+
+        ans['portfolio_value'] = ans['price'] * arrays['quantity']
+        ans['portfolio_dv01']  = ans['dv01'] * arrays['quantity']
+        ans['buckets']         = nomes
+        ans['aggregates']      = {'Valor'  : ans['portfolio_value'].sum(),
+                                  'DV01'   : ans['portfolio_dv01'].sum(),
+                                  'KRDV01' : dict(zip(nomes, ans['krdv01'].sum(axis = 0)))}
+
+        return ans
+
+    def __str__(self):
+        return f'ParallelPricer(n_workers = {self.n_workers}, n_shards = {self.n_shards})'
+
+    def __repr__(self):
+        return self.__str__()
@@ -4,23 +4,133 @@ Author : Milton Rocha
 Medium : https://medium.com/@milton-rocha
 """
 
-from copy        import deepcopy
-from tabulate    import tabulate
-from typing      import Union
+from collections.abc import Mapping
+from copy            import copy, deepcopy
+from tabulate        import tabulate
+from typing          import Iterable, Iterator, Union
 
 import pandas as pd
 import numpy  as np
 
-from calc_utils import (FlatForward,
-                        Fluxos)
-from date_utils import feriados
+from calc_utils import (FLUXOS_CACHE,
+                        CashflowTable,
+                        coupon_schedule,
+                        FlatCurve,
+                        FlatForward,
+                        Fluxos,
+                        YieldCurve,
+                        fluxos_vetorizados,
+                        key_rate_weights)
+from date_utils import (BusinessCalendar,
+                        HOLIDAY_STORE,
+                        as_calendar,
+                        parse_dates)
                         
 
 # Desativa a função __array_function__ do numpy, que prejudica performance
 import os
 os.environ['NUMPY_EXPERIMENTAL_ARRAY_FUNCTION'] = '0'
 
-HOLIDAYS = pd.read_parquet('holidays.parquet')['Data'].values.astype('datetime64[D]')
+def __getattr__(name : str):
+
+    """
+        HOLIDAYS e CALENDAR são carregados somente no primeiro uso, a partir de
+    HOLIDAY_STORE (arquivo resolvido pela pasta do pacote, não pelo diretório
+    de trabalho)
+    """
+
+    if name == 'HOLIDAYS': return HOLIDAY_STORE.load()
+    if name == 'CALENDAR': return HOLIDAY_STORE.calendar
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+# Parâmetros de cada título público, os mesmos utilizados pelas classes LTN, NTNF, NTNB e LFT ('Bond' = defaults da classe Bond)
+INSTRUMENTOS = {'LTN'  : {'annual_coupon' : 0.,  'coupon_frequency' : 0, 'face_value' : 1000., 'risk_type' : 'Nominal'},
+                'NTNF' : {'annual_coupon' : .1,  'coupon_frequency' : 2, 'face_value' : 1000., 'risk_type' : 'Nominal'},
+                'NTNB' : {'annual_coupon' : .06, 'coupon_frequency' : 2, 'face_value' : 1.,    'risk_type' : 'Real'},
+                'LFT'  : {'annual_coupon' : 0.,  'coupon_frequency' : 0, 'face_value' : 1.,    'risk_type' : 'Over'},
+                'Bond' : {'annual_coupon' : 0.,  'coupon_frequency' : 0, 'face_value' : 1.,    'risk_type' : 'Nominal'}}
+
+def instrument_params(instrument : str,
+                      **kwargs) -> dict:
+    
+    """
+    Parâmetros (annual_coupon, coupon_frequency, face_value, risk_type) de um
+    instrumento de INSTRUMENTOS, os valores em **kwargs sobrepõem os do instrumento
+    
+    Códigos fora de INSTRUMENTOS retornam ValueError
+    """
+    
+    if str(instrument) not in INSTRUMENTOS:
+        raise ValueError(f'Instrumento desconhecido: {str(instrument)!r}, utilize um de {list(INSTRUMENTOS)}')
+    
+    spec = INSTRUMENTOS[str(instrument)]
+    
+    return {param : kwargs.get(param, valor) for param, valor in spec.items()}
+
+def position_params(instruments : Union[str, list, np.ndarray],
+                    n           : int,
+                    **kwargs) -> dict:
+    
+    """
+    Parâmetros de cada uma das n posições, conforme instrument_params
+    
+        Retorna dict {parâmetro : np.ndarray de tamanho n}, os valores em
+    **kwargs (escalares ou por posição) sobrepõem os de INSTRUMENTOS
+    """
+    
+    instruments    = np.broadcast_to(np.asarray(instruments, dtype = str), (n,))
+    tipos, inverso = np.unique(instruments, return_inverse = True)
+    specs          = [instrument_params(t) for t in tipos]
+    
+    params = {}
+    for param, default in INSTRUMENTOS['Bond'].items():
+        valores = np.array([spec[param] for spec in specs])[inverso] if n else np.array([], dtype = type(default))
+        params[param] = np.broadcast_to(np.asarray(kwargs.get(param, valores)), (n,)).copy()
+    
+    return params
+
+# Buckets padrão (em dias úteis) para alocação do risco de curva (KRDV01)
+RISK_BUCKETS = {'1M'  : 21,   '3M' : 63,   '6M'  : 126,  '9M'  : 189,  '1Y'  : 252,
+                '18M' : 378,  '2Y' : 504,  '3Y'  : 756,  '4Y'  : 1008, '5Y'  : 1260,
+                '7Y' : 1764, '10Y' : 2520, '20Y' : 5040, '30Y' : 7560}
+
+class _LazyField:
+    
+    """
+        Atributo do Bond calculado somente no primeiro acesso e guardado em
+    cache (obj._cache), pelo método do grupo ao qual pertence (__price__,
+    __risks__ ou __bucketting__). O cache é descartado quando taxa, curva,
+    VNA, quantidade, spread ou buckets mudam (vide Bond.__setattr__) ou
+    quando a yield_curve for atualizada (FlatForward.update)
+    """
+    
+    def __init__(self, metodo : str):
+        self.metodo = metodo
+    
+    def __set_name__(self, owner, name):
+        self.name = name
+    
+    def __get__(self, obj, owner = None):
+        
+        if obj is None: return self
+        
+        cache = obj.__dict__.get('_cache')
+        if cache is None or obj.stale: cache = obj.__invalidate__()
+        
+        if self.name not in cache:
+            if self.metodo == '__bucketting__' and not obj.bucketting:
+                raise AttributeError(f'{self.name} só está disponível com bucketting = True')
+            getattr(obj, self.metodo)()
+            # O método pode ter descartado o cache (ex.: __bucketting__ definindo risk_buckets)
+            cache = obj.__dict__['_cache']
+        
+        return cache[self.name]
+    
+    def __set__(self, obj, value):
+        
+        cache = obj.__dict__.get('_cache')
+        if cache is None: cache = obj.__invalidate__()
+        cache[self.name] = value
 
 class Bond:
     
@@ -38,19 +148,27 @@ class Bond:
             Valor de FACE do Bond
         - VNA, float, default = 1:
             Valor Nominal Atualizado do Bond
-        - yield_curve, object, default = FlatForward flat yield:
-            Curva de juros a ser utilizada para descontar os fluxos
-        - holidays, (list, np.ndarray), default = feriados():
-            Lista ou np.ndarray contendo os feriados do país de precificação
+        - yield_curve, YieldCurve (FlatForward, FlatCurve), default = None:
+            Curva de juros a ser utilizada para descontar os fluxos, caso não
+            seja fornecida os fluxos são descontados pela bond_yield (YTM)
+        - spread, float, default = 0:
+            Spread (z-spread) somado às taxas da yield_curve em cada fluxo,
+            somente utilizado quando yield_curve é fornecida
+        - holidays, (BusinessCalendar, list, np.ndarray), default = HOLIDAY_STORE.calendar:
+            BusinessCalendar ou lista/np.ndarray contendo os feriados do país
+            de precificação
         - bucketting, bool, default = False:
             Caso True, fará o bucketeamento do risco do Bond
-        - risk_buckets, dict, default = vide método:
+        - risk_buckets, dict, default = RISK_BUCKETS:
             Buckets nos quais serão alocados os riscos, formato:
                 {NOME_BUCKET : prazo}
         - risk_type, str, default = Nominal:
             Tag que facilita a alocação posterior de bucketeamento
         - bond_name, str, default = Bond:
             Nome do bond que será mostrado em listas e str
+        - cache_fluxos, bool, default = True:
+            Caso True, os fluxos são obtidos de FLUXOS_CACHE (compartilhados
+            entre Bonds idênticos)
     
     """
     
@@ -75,18 +193,51 @@ class Bond:
         # Rolagem das datas de início e de fim
         self.__date_roll__()
         
-        # Cálculo do PU
-        self.__price__()
+        #   PU, riscos e bucketeamento são calculados somente quando acessados
+        # (vide _LazyField), reprice() força o cálculo de todos
+    
+    # Atributos calculados sob demanda ------------------------------------------
+    pz                  = _LazyField('__price__')
+    discount_factors    = _LazyField('__price__')
+    cotacao             = _LazyField('__price__')
+    vp_fatores          = _LazyField('__price__')
+    price               = _LazyField('__price__')
+    portfolio_value     = _LazyField('__price__')
+    
+    duration            = _LazyField('__risks__')
+    mod_duration        = _LazyField('__risks__')
+    dvs                 = _LazyField('__risks__')
+    dv01                = _LazyField('__risks__')
+    convexity           = _LazyField('__risks__')
+    portfolio_dv01      = _LazyField('__risks__')
+    portfolio_dvs       = _LazyField('__risks__')
+    portfolio_convexity = _LazyField('__risks__')
+    
+    curve_risks         = _LazyField('__bucketting__')
+    
+    # Variáveis que, quando alteradas, invalidam os atributos calculados
+    _INVALIDA = frozenset(['bond_yield', 'yield_curve', 'VNA', 'quantity', 'spread', 'face_value',
+                           'risk_buckets', 'bucketting'])
+    
+    def __setattr__(self, name, value):
         
-        # Cálculo de riscos e bucketeamento de risco
-        self.__risks__()
-        if self.bucketting: self.__bucketting__()
+        super().__setattr__(name, value)
+        if name in self._INVALIDA and '_cache' in self.__dict__: self.__invalidate__()
+    
+    def __invalidate__(self) -> dict:
+        
+        """
+        Descarta os atributos calculados (um dict novo, de forma que cópias rasas não compartilhem o cache)
+        """
+        
+        self.__dict__['_cache'] = {}
+        self.__dict__.pop('curve_version', None)
+        
+        return self.__dict__['_cache']
     
     def __flat_yc__(self):
         
-        return FlatForward([i for i in range(1, 10001)],
-                           [self.bond_yield for i in range(1, 10001)],
-                           extrapolate = True)
+        return FlatCurve(self.bond_yield)
     
     def __initialize_variables__(self):
         
@@ -113,13 +264,17 @@ class Bond:
         self.face_value       = self.__get_variable__(['face_value', 'valor_face', 'face'], 1.)
         self.VNA              = self.__get_variable__(['VNA', 'vna'], 1.)
         self.yield_curve      = self.__get_variable__(['yield_curve', 'yc', 'curva'], None)
+        self.spread           = self.__get_variable__(['spread', 'z_spread'], 0.)
         self.bucketting       = self.__get_variable__(['bucketting'], False)
         self.risk_buckets     = self.__get_variable__(['risk_buckets'], None)
         self.risk_type        = self.__get_variable__(['risk_type'], 'Nominal')
         self.bond_name        = self.__get_variable__(['bond_name'], 'Bond')
         self.quantity         = self.__get_variable__(['quantity', 'quantidade'], 1.)
+        self.cache_fluxos     = self.__get_variable__(['cache_fluxos'], True)
         
-        self.holidays         = self.__get_variable__(['feriados', 'holidays', 'fer', 'hol'], HOLIDAYS)
+        self.holidays         = self.__get_variable__(['feriados', 'holidays', 'fer', 'hol', 'calendar'], None)
+        self.calendar         = as_calendar(self.holidays)
+        self.holidays         = self.calendar if self.holidays is None else self.holidays
         
         #   Tratamento de variáveis que utilizam outras funções
         # em caso de variável base dependente de método ou fórmula, a função
@@ -129,12 +284,20 @@ class Bond:
         self.full_name = f'@ {self.bond_name}|{str(self.maturity).split("-")[0]}|{self.bond_yield:.2%}'
         
         # Primeiros passos de variáveis de fluxos -----------------------------
-        # objeto de fluxos
-        self.fs = Fluxos(self.val_date,
-                         self.maturity,
-                         self.annual_coupon,
-                         self.coupon_frequency,
-                         self.holidays)
+        #   objeto de fluxos, compartilhado (somente leitura) via FLUXOS_CACHE
+        # entre Bonds idênticos, caso cache_fluxos = True
+        if self.cache_fluxos:
+            self.fs = FLUXOS_CACHE.get(self.val_date,
+                                       self.maturity,
+                                       self.annual_coupon,
+                                       self.coupon_frequency,
+                                       self.calendar)
+        else:
+            self.fs = Fluxos(self.val_date,
+                             self.maturity,
+                             self.annual_coupon,
+                             self.coupon_frequency,
+                             self.calendar)
         
         # Dados dos fluxos
         self.coupons = self.fs.cupons
@@ -177,13 +340,9 @@ class Bond:
         
         """
         
-        self.val_date = np.busday_offset(self.val_date, 0,
-                                         roll = 'forward',
-                                         holidays = self.holidays)
+        self.val_date = self.calendar.roll(self.val_date, roll = 'forward')
         
-        self.maturity = np.busday_offset(self.maturity, 0,
-                                           roll = 'forward',
-                                           holidays = self.holidays)
+        self.maturity = self.calendar.roll(self.maturity, roll = 'forward')
 
     
     def __price__(self):
@@ -199,13 +358,17 @@ class Bond:
         
         self.pz = self.dus/252.
         
-        if isinstance(self.yield_curve, type(FlatForward([0], [1]))):
+        if isinstance(self.yield_curve, YieldCurve):
             #   Caso o objeto fornecido em yield_curve exista, fará o cálculo
-            # na curva de juros
-            self.discount_factors = 1./(1. + self.yield_curve(self.dus)) ** self.pz
+            # na curva de juros (caminho vetorizado da curva)
+            # (somado ao spread sobre a curva, caso fornecido)
+            self.discount_factors = self.yield_curve.discount_factors(self.dus, self.spread) if self.spread else \
+                                    self.yield_curve.discount_factors(self.dus)
+            # Versão da curva utilizada, para identificar quando a curva for atualizada
+            self.curve_version = self.yield_curve.version
         else:
-            # Caso não tenha objeto, será calculado utilizando YTM
-            self.discount_factors = 1./(1. + self.bond_yield) ** self.pz
+            # Caso não tenha objeto, será calculado utilizando YTM (forma fechada, sem construir curva)
+            self.discount_factors = FlatCurve.discount(self.bond_yield, self.dus)
         
         
         self.cotacao = self.fatores *  self.discount_factors
@@ -213,6 +376,31 @@ class Bond:
         self.price = sum(self.vp_fatores)
         self.portfolio_value = self.price * self.quantity
     
+    @property
+    def stale(self) -> bool:
+        
+        """
+        Indica se a curva de juros utilizada foi atualizada (FlatForward.update)
+        após o último cálculo do Bond, os atributos calculados são refeitos no
+        próximo acesso
+        """
+        
+        return isinstance(self.yield_curve, YieldCurve) and 'curve_version' in self.__dict__ and \
+               self.yield_curve.version != self.__dict__['curve_version']
+    
+    def reprice(self):
+        
+        """
+        Recalcula preço, riscos e bucketeamento com o estado atual do Bond e da curva
+        """
+        
+        self.__invalidate__()
+        self.__price__()
+        self.__risks__()
+        if self.bucketting: self.__bucketting__()
+        
+        return self.price
+    
     def __risks__(self):
         
         """
@@ -278,93 +466,32 @@ class Bond:
         return ans
     
     def __bucketting__(self,
-                       quantidade : int = 1,
+                       quantidade : Union[int, None] = None,
                        suppress   : bool = True):
         
         """
         Função que fornece o bucketeamento do risco do ativo
         
-            Alocação de risco por vértices fixos determinados pelo usuário
+            Alocação de risco por vértices fixos determinados pelo usuário, a
+        quantidade de uma chamada manual é guardada e reutilizada quando
+        curve_risks for recalculado
         
         """
         
-        # Caso o usuário já tenha preenchido a quantidade no init, utilizará ela
-        quantidade = self.quantity if self.quantity != 1 else quantidade
-        
-        # Dentre as funções feitas é a mais lenta, tenho que melhorar
-        # Bucketting piora o processamento em 1.5 a 3x o tempo necessário
-        self.bucketting = True # Caso o usuário rode manualmente, override
-        buckets_default = {'1M'  : 21,   '3M' : 63,   '6M'  : 126,  '9M'  : 189,  '1Y'  : 252,
-                           '18M' : 378,  '2Y' : 504,  '3Y'  : 756,  '4Y'  : 1008, '5Y'  : 1260,
-                           '7Y' : 1764, '10Y' : 2520, '20Y' : 5040, '30Y' : 7560}
-        
-        if not self.risk_buckets: self.risk_buckets = buckets_default
+        if quantidade is not None: self._quantidade_buckets = quantidade
         
-        buckets_list = np.array([self.risk_buckets[bucket] for bucket in self.risk_buckets])
-        buckets_list.sort()
-        
-        buckets_value = np.zeros(buckets_list.shape)
+        # Caso o usuário já tenha preenchido a quantidade no init, utilizará ela
+        quantidade = self.quantity if self.quantity != 1 else getattr(self, '_quantidade_buckets', 1)
         
-        min_serie = min(buckets_list)
-        max_serie = max(buckets_list)
+        # Caso o usuário rode manualmente, override (somente quando alterados, para não descartar o cache)
+        if not self.bucketting: self.bucketting = True
+        if not self.risk_buckets: self.risk_buckets = RISK_BUCKETS
         
-        def __find_nearest__(value : float,
-                             array : np.ndarray):
-    
-            """
-            Method used to find the nearest points of a given maturity
-            """
-            
-            idx = np.searchsorted(array, value, side="left")
+        # Pesos de alocação construídos uma única vez por grade de buckets (vide KeyRateWeights)
+        pesos = key_rate_weights(self.risk_buckets)
+        buckets_list  = pesos.buckets
+        buckets_value = pesos.allocate(self.dus, self.dvs)
         
-            if idx > 0 and (idx == len(array) or np.abs(value - array[idx-1]) < np.abs(value - array[idx])):
-                idx = idx - 1
-            
-            if array[idx] < value and idx < len(array) - 1:
-              idx_1, idx_2 = idx, idx + 1
-            elif array[idx] > value and idx > 0:
-              idx_1, idx_2 = idx - 1, idx
-            elif idx == len(array) - 1 or idx == 0:
-              idx_1, idx_2 = idx, idx 
-        
-            return np.array([idx_1, idx_2])
-        
-        def __closest__(maturity : float,
-                        dus : list,
-                        dvs : list):
-            
-            """
-            For a given maturity this method will return the pair of maturities and yields closest to it
-            """
-        
-            idxs = __find_nearest__(maturity, dus)
-            dus = dus[idxs]
-            dvs = dvs[idxs]
-        
-            return np.array([*dus, *dvs])
-        
-        for du, exposicao in zip(self.dus, self.dvs):
-            if du in buckets_list:
-                buckets_value[np.where(buckets_list == du)] += exposicao
-            if du < min_serie:
-                buckets_value[0] += exposicao * du / min_serie
-            if du > max_serie:
-                buckets_value[-1] += exposicao * du / max_serie
-            if du > min_serie and du < max_serie:
-                
-                # Método antigo para calcular ant e post, válido mas menos eficaz
-                # ant, post = sorted(buckets_list[np.sort(np.argpartition(list(map(lambda x: abs(x - du), buckets_list)), 2)[:2])])
-                
-                ant, post, dv_ant, dv_post = __closest__(du, buckets_list, buckets_value)
-                
-                # Cálculo da exposições
-                exp_ant  = exposicao * (post - du)/(post - ant)
-                exp_post = exposicao * (du - ant)/(post - ant)
-
-                # Preenche os valores da quebra
-                buckets_value[np.where(buckets_list == ant)]  = dv_ant + exp_ant
-                buckets_value[np.where(buckets_list == post)] = dv_post + exp_post
-                
         buckets_value = buckets_value * quantidade
 
         self.curve_risks = {bucket:[du, risco] for bucket, du, risco in zip(self.risk_buckets, buckets_list, buckets_value)}
@@ -399,12 +526,51 @@ class Bond:
         return self.price
 
 
+class _SolverResult(Mapping):
+    
+    """
+        Resultado do BondSolver, as chaves pesadas (final_bond e
+    convergence_path) são construídas somente no primeiro acesso
+    
+        keys(), items(), len() e `in` consideram todas as chaves, inclusive as
+    ainda não construídas, e tanto obj[chave] quanto obj.get(chave) as constroem
+    """
+    
+    def __init__(self, builders : dict, **kwargs):
+        self.__valores  = dict(kwargs)
+        self.__builders = dict(builders)
+    
+    def __getitem__(self, key):
+        
+        if key not in self.__valores:
+            if key not in self.__builders: raise KeyError(key)
+            self.__valores[key] = self.__builders.pop(key)()
+        
+        return self.__valores[key]
+    
+    def __iter__(self):
+        yield from self.__valores
+        yield from list(self.__builders)
+    
+    def __len__(self):
+        return len(self.__valores) + len(self.__builders)
+    
+    def __contains__(self, key):
+        return key in self.__valores or key in self.__builders
+    
+    def __repr__(self):
+        pendentes = ', '.join(f'{k!r}: <lazy>' for k in self.__builders)
+        return '{' + ', '.join(f'{k!r}: {v!r}' for k, v in self.__valores.items()) + (', ' + pendentes if pendentes else '') + '}'
+
 class BondSolver:
     
+    TRACE_LEVELS = ('none', 'scalar', 'full')
+    
     def __init__(self,
                  base_bond : Bond,
                  precision : float = 1e-8,
-                 max_iter  : int = 1000):
+                 max_iter  : int = 1000,
+                 trace     : str = 'scalar'):
         """
         Classe de solução de bonds dado preço objetivo
         
@@ -416,17 +582,50 @@ class BondSolver:
             Precisão mínima, em reais, que se deseja atingir. The default is 1e-8.
         max_iter : int, optional
             Máximo de iterações a ser feito. The default is 1000.
+        trace : str, optional
+            Nível de registro do caminho de convergência. The default is 'scalar'.
+                - 'none'   : convergence_path = None
+                - 'scalar' : Yield, Price, Price_Objective, DV01 e Error por iteração
+                - 'full'   : 'scalar' mais um Bond materializado por iteração
         """
+        
+        if trace not in self.TRACE_LEVELS:
+            raise ValueError(f'trace deve ser um de {self.TRACE_LEVELS}, recebido {trace!r}')
+        
         self.bond      = deepcopy(base_bond)
         self.precision = precision
         self.max_iter  = max_iter
+        self.trace     = trace
+        
+        # Arrays de fluxos do Bond base, reaproveitados a cada iteração
+        self.__pz = np.asarray(self.bond.dus) / 252.
+        self.__vf = self.bond.face_value * self.bond.VNA * np.asarray(self.bond.fatores)
+    
+    def __materialize__(self,
+                        bond_yield : float) -> Bond:
+        
+        """
+        Constrói o Bond base precificado (por YTM) na taxa fornecida
+        """
         
+        bond = copy(self.bond)
+        bond.bond_yield  = bond_yield
+        bond.yield_curve = None
+        bond.full_name   = f'@ {bond.bond_name}|{str(bond.maturity).split("-")[0]}|{bond_yield:.2%}'
+        bond.reprice()
+        
+        return bond
+    
     def __solve__(self,
                   price_obj : float):
         
         """
         Método principal de solução para um preço desejado
         
+            As iterações são feitas diretamente sobre os arrays de fluxos do
+        Bond base (preço e DV01 em forma fechada), sem reconstruir o Bond a
+        cada passo
+        
         Parâmetros
         ----------
         price_obj : float
@@ -434,48 +633,64 @@ class BondSolver:
         """
         
         self.price_obj = price_obj
-
-        bond = deepcopy(self.bond)
         
-        d = []
+        pz, vf = self.__pz, self.__vf
         
-        i = 0
-        error = bond.price - self.price_obj
-        d.append([bond.bond_yield, bond.price, self.price_obj, bond.dv01, error, deepcopy(bond)])
+        def __price_dv01__(y : float) -> tuple:
+            vp    = vf * (1. + y) ** -pz
+            price = vp.sum()
+            return price, -(pz * vp).sum()/(1. + y)/10000.
+        
+        bond_yield  = float(self.bond.bond_yield)
+        price, dv01 = __price_dv01__(bond_yield)
+        error       = price_obj - price
         
+        registra = self.trace != 'none'
+        d = np.empty((self.max_iter + 1 if registra else 0, 4))
+        if registra: d[0] = bond_yield, price, dv01, error
+        
+        i = 0
         while i < self.max_iter and abs(error) > self.precision:
             
             # Newton-Raphson formalizado:
             # x_n     = x_(n-1) - f(x_n)/f'(x_n)
             
             # x_n     = estimativa
-            # x_(n-1) = bond.bond_yield
-            # f(x_n)  = bond.price
-            # f'(x_n) = bond.dv01
+            # x_(n-1) = bond_yield
+            # f(x_n)  = price
+            # f'(x_n) = dv01
             
             #  Detalhe : sensibilidade por DV01 mostra o shift, em $, para cada
             # variação de 0.01% na taxa de desconto, temos que considerar isso
             # para a derivada que será utilizada
             
-            est_yield = bond.bond_yield + (self.price_obj - bond.price)/bond.dv01/10000.
-            bond.bond_yield    = est_yield
-            bond = Bond(**vars(bond))
-            error     = self.price_obj - bond.price
-            
-            if i > 0: d.append([bond.bond_yield, bond.price, self.price_obj, bond.dv01, error, deepcopy(bond)])
+            bond_yield  = bond_yield + (price_obj - price)/dv01/10000.
+            price, dv01 = __price_dv01__(bond_yield)
+            error       = price_obj - price
             
             i+=1
+            if registra: d[i] = bond_yield, price, dv01, error
+        
+        d = d[:i + 1]
         
-        df = pd.DataFrame(d,
-                          columns = ['Yield', 'Price', 'Price_Objective', 'DV01', 'Error', 'Bond'],
-                          index = pd.Series(range(1, i+1), name = 'Iteration'))
+        def __path__():
+            
+            if not registra: return None
+            
+            df = pd.DataFrame(d, columns = ['Yield', 'Price', 'DV01', 'Error'],
+                              index = pd.RangeIndex(0, i + 1, name = 'Iteration'))
+            df.insert(2, 'Price_Objective', price_obj)
+            
+            if self.trace == 'full': df['Bond'] = [self.__materialize__(y) for y in df['Yield']]
+            
+            return df
         
-        return {'Sol_Yield'        : bond.bond_yield,
-                'Sol_Precision'    : error,
-                'iterations'       : i,
-                'initial_bond'     : self.bond,
-                'final_bond'       : bond,
-                'convergence_path' : df}
+        return _SolverResult({'final_bond'       : lambda: self.__materialize__(bond_yield),
+                              'convergence_path' : __path__},
+                             Sol_Yield     = bond_yield,
+                             Sol_Precision = error,
+                             iterations    = i,
+                             initial_bond  = self.bond)
     
     def __call__(self,
                  price_obj : float) -> dict:
@@ -485,6 +700,232 @@ class BondSolver:
         """
         return self.__solve__(price_obj)
 
+def _newton_rates(table      : CashflowTable,
+                  notional   : np.ndarray,
+                  targets    : np.ndarray,
+                  guess      : np.ndarray,
+                  base_rates : Union[np.ndarray, None] = None,
+                  days_year  : int = 252,
+                  precision  : float = 1e-8,
+                  max_iter   : int = 100,
+                  bounds     : tuple = (-.99, 10.)) -> dict:
+    
+    """
+    Newton-Raphson vetorizado da taxa x de cada título para um conjunto de preços objetivo
+    
+        Preço de cada título: soma de notional * fator * (1 + base + x) ** -(du/days_year)
+    sobre os seus fluxos, com base = 0 (YTM) ou a taxa da curva em cada fluxo
+    (spread sobre a curva). Preço e derivada vêm direto dos arrays de fluxos e
+    somente os títulos ainda não convergidos são recalculados a cada passo.
+    
+        Cada título mantém um intervalo [lo, hi] que contém a solução (o preço
+    é decrescente na taxa), caso o passo de Newton saia do intervalo ou a
+    derivada não seja válida, o passo é substituído pela bisseção do intervalo
+    
+    Retorna dict com rates, iterations, residuals (objetivo - preço) e converged
+    """
+    
+    n   = table.n_bonds
+    pz  = table.dus / days_year
+    vf  = table.fatores * table.expand(np.asarray(notional, dtype = float))
+    ids = table.bond_id
+    
+    base = np.zeros(len(pz)) if base_rates is None else np.asarray(base_rates, dtype = float)
+    
+    targets = np.broadcast_to(np.asarray(targets, dtype = float), (n,)).copy()
+    x       = np.broadcast_to(np.asarray(guess, dtype = float), (n,)).copy()
+    
+    # Limite inferior garante 1 + base + x > 0 em todos os fluxos do título
+    lo = np.full(n, float(bounds[0]))
+    if len(base):
+        base_min = np.full(n, np.inf)
+        np.minimum.at(base_min, ids, base)
+        lo = np.maximum(lo, np.where(np.isfinite(base_min), -1. - base_min + 1e-12, lo))
+    hi = np.full(n, float(bounds[1]))
+    x  = np.clip(x, lo, hi)
+    
+    iteracoes = np.zeros(n, dtype = np.int64)
+    residuos  = np.full(n, np.nan)
+    ativos    = np.ones(n, dtype = bool)
+    
+    for i in range(max_iter + 1):
+        
+        fluxos = ativos[ids]
+        id_a, pz_a = ids[fluxos], pz[fluxos]
+        
+        fator = (1. + base[fluxos] + x[id_a]) ** -pz_a
+        vp    = vf[fluxos] * fator
+        
+        preco    = np.bincount(id_a, weights = vp, minlength = n)
+        derivada = np.bincount(id_a, weights = -pz_a * vp / (1. + base[fluxos] + x[id_a]), minlength = n)
+        
+        residuos[ativos] = (targets - preco)[ativos]
+        ativos &= ~(np.abs(residuos) <= precision)
+        
+        if not ativos.any() or i == max_iter: break
+        
+        # Atualização do intervalo: preço acima do objetivo => taxa abaixo da solução
+        acima = ativos & (residuos < 0.)
+        abaixo = ativos & (residuos > 0.)
+        lo[acima]  = x[acima]
+        hi[abaixo] = x[abaixo]
+        
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            passo = x - residuos / -derivada
+        
+        bissecao = ~np.isfinite(passo) | (passo <= lo) | (passo >= hi)
+        novo = np.where(bissecao, (lo + hi) / 2., passo)
+        
+        x[ativos] = novo[ativos]
+        iteracoes[ativos] += 1
+    
+    return {'rates'      : x,
+            'iterations' : iteracoes,
+            'residuals'  : residuos,
+            'converged'  : np.abs(residuos) <= precision}
+
+class BatchBondSolver:
+    
+    """
+        Versão vetorizada do BondSolver: resolve a taxa (YTM) de vários títulos
+    para vários preços objetivo de uma só vez (vide _newton_rates)
+    
+    Variáveis:
+        bonds     : lista de Bonds ou BondPortfolio, as taxas atuais são utilizadas como chute inicial
+        precision : precisão mínima, em reais, que se deseja atingir
+        max_iter  : máximo de iterações
+    
+    """
+    
+    def __init__(self,
+                 bonds     : Union[list, 'BondPortfolio'],
+                 precision : float = 1e-8,
+                 max_iter  : int = 100):
+        
+        if isinstance(bonds, BondPortfolio):
+            self.table    = bonds.table
+            self.notional = bonds.face_value * bonds.VNA
+            self.guess    = bonds.yields.copy()
+        else:
+            bonds = list(bonds)
+            self.table    = CashflowTable.from_fluxos([b.fs for b in bonds])
+            self.notional = np.array([b.face_value * b.VNA for b in bonds], dtype = float)
+            self.guess    = np.array([b.bond_yield for b in bonds], dtype = float)
+        
+        self.bonds     = bonds
+        self.precision = precision
+        self.max_iter  = max_iter
+    
+    def __solve__(self,
+                  prices_obj : Union[float, list, np.ndarray],
+                  guess      : Union[float, list, np.ndarray, None] = None) -> dict:
+        
+        """
+        Método principal de solução para os preços desejados
+        """
+        
+        ans = _newton_rates(self.table, self.notional, prices_obj,
+                            self.guess if guess is None else guess,
+                            precision = self.precision, max_iter = self.max_iter)
+        
+        return {'yields'     : ans['rates'],
+                'iterations' : ans['iterations'],
+                'residuals'  : ans['residuals'],
+                'converged'  : ans['converged']}
+    
+    def __call__(self,
+                 prices_obj : Union[float, list, np.ndarray],
+                 guess      : Union[float, list, np.ndarray, None] = None) -> dict:
+        return self.__solve__(prices_obj, guess)
+    
+    def __len__(self):
+        return self.table.n_bonds
+
+
+class ZSpreadSolver:
+    
+    """
+        Solver vetorizado do spread constante sobre uma curva (z-spread) que
+    reproduz o preço de mercado de cada título
+    
+        Cada fluxo é descontado por (1 + r(du) + s) ** -(du/252), com r(du) a
+    taxa da curva no prazo do fluxo (mesmo caminho de Bond.__price__ com
+    spread). As taxas da curva são interpoladas uma única vez, na construção
+    do objeto, e reaproveitadas em todas as iterações e chamadas; todos os
+    títulos são resolvidos juntos por _newton_rates
+    
+    Variáveis:
+        bonds       : lista de Bonds ou BondPortfolio
+        yield_curve : YieldCurve, default = yield_curve dos títulos (a mesma para todos)
+        precision   : precisão mínima, em reais, que se deseja atingir
+        max_iter    : máximo de iterações
+    
+    """
+    
+    def __init__(self,
+                 bonds       : Union[list, 'BondPortfolio'],
+                 yield_curve : Union[YieldCurve, None] = None,
+                 precision   : float = 1e-8,
+                 max_iter    : int = 100):
+        
+        if isinstance(bonds, BondPortfolio):
+            self.table    = bonds.table
+            self.notional = bonds.face_value * bonds.VNA
+            curvas        = [bonds.yield_curve]
+        else:
+            bonds = list(bonds)
+            self.table    = CashflowTable.from_fluxos([b.fs for b in bonds])
+            self.notional = np.array([b.face_value * b.VNA for b in bonds], dtype = float)
+            curvas        = [b.yield_curve for b in bonds]
+        
+        if yield_curve is None:
+            yield_curve = curvas[0] if curvas else None
+            if not isinstance(yield_curve, YieldCurve) or any(c is not yield_curve for c in curvas):
+                raise ValueError('Forneça yield_curve ou títulos precificados em uma mesma YieldCurve')
+        
+        self.bonds       = bonds
+        self.yield_curve = yield_curve
+        self.precision   = precision
+        self.max_iter    = max_iter
+        self.__update_rates__()
+    
+    def __update_rates__(self):
+        
+        """
+        Taxas da curva em cada fluxo, recalculadas somente quando a curva for atualizada
+        """
+        
+        self.curve_rates   = self.yield_curve(self.table.dus.astype(float))
+        self.curve_version = self.yield_curve.version
+    
+    def __solve__(self,
+                  prices_obj : Union[float, list, np.ndarray],
+                  guess      : Union[float, list, np.ndarray] = 0.) -> dict:
+        
+        """
+        Método principal de solução para os preços desejados
+        """
+        
+        if self.yield_curve.version != self.curve_version: self.__update_rates__()
+        
+        ans = _newton_rates(self.table, self.notional, prices_obj, guess,
+                            base_rates = self.curve_rates, days_year = self.yield_curve.days_year,
+                            precision = self.precision, max_iter = self.max_iter)
+        
+        return {'spreads'    : ans['rates'],
+                'iterations' : ans['iterations'],
+                'residuals'  : ans['residuals'],
+                'converged'  : ans['converged']}
+    
+    def __call__(self,
+                 prices_obj : Union[float, list, np.ndarray],
+                 guess      : Union[float, list, np.ndarray] = 0.) -> dict:
+        return self.__solve__(prices_obj, guess)
+    
+    def __len__(self):
+        return self.table.n_bonds
+
+
 class LFT(Bond):
     
     """
@@ -562,3 +1003,991 @@ class NTNF(Bond):
                          coupon_frequency = 2,
                          bond_name = 'NTNF',
                          **kwargs)
+
+
+class BondPortfolio:
+    
+    """
+        Classe de precificação e cálculo de risco vetorizados para um portfólio
+    de títulos
+    
+        Equivalente a construir um Bond (LTN, NTNF, NTNB, LFT) para cada posição,
+    porém todos os fluxos ficam em um único CashflowTable e preço, duration,
+    duration modificada, DV01 e convexidade são calculados em passagens
+    vetorizadas do numpy sobre a tabela inteira
+    
+    Variáveis:
+        val_date    : data de precificação comum a todas as posições
+        instruments : tipo de cada posição ('LTN', 'NTNF', 'NTNB', 'LFT' ou 'Bond'), outros códigos retornam ValueError
+        maturities  : vencimento de cada posição
+        yields      : taxa de cada posição
+        VNA         : VNA de cada posição (títulos não indexados utilizam 1)
+        quantity    : quantidade de cada posição
+        holidays    : BusinessCalendar ou lista de feriados, default = HOLIDAY_STORE.calendar
+        yield_curve : YieldCurve utilizada para descontar os fluxos, default = None (YTM)
+        spread      : spread (z-spread) de cada posição sobre a yield_curve, default = 0 (vide Bond)
+    
+    **kwargs ACEITOS (por posição, sobrepõem os valores de INSTRUMENTOS):
+        - annual_coupon, coupon_frequency, face_value, risk_type
+    
+    """
+    
+    def __init__(self,
+                 val_date    : Union[str, np.datetime64],
+                 instruments : Union[str, list, np.ndarray],
+                 maturities  : Union[list, np.ndarray],
+                 yields      : Union[float, list, np.ndarray],
+                 VNA         : Union[float, list, np.ndarray] = 1.,
+                 quantity    : Union[float, list, np.ndarray] = 1.,
+                 holidays    : Union[BusinessCalendar, list, np.ndarray, None] = None,
+                 yield_curve : Union[YieldCurve, None] = None,
+                 spread      : Union[float, list, np.ndarray] = 0.,
+                 table       : Union[CashflowTable, None] = None,
+                 **kwargs):
+        
+        self.calendar    = as_calendar(holidays)
+        self.yield_curve = yield_curve
+        self.maturities  = np.atleast_1d(parse_dates(maturities))
+        
+        n = len(self.maturities)
+        
+        self.instruments = np.broadcast_to(np.asarray(instruments, dtype = str), (n,))
+        self.yields      = np.broadcast_to(np.asarray(yields, dtype = float), (n,)).copy()
+        self.VNA         = np.broadcast_to(np.asarray(VNA, dtype = float), (n,)).copy()
+        self.quantity    = np.broadcast_to(np.asarray(quantity, dtype = float), (n,)).copy()
+        self.spread      = np.broadcast_to(np.asarray(spread, dtype = float), (n,)).copy()
+        
+        # Parâmetros de cada instrumento, o tipo 'Bond' utiliza os mesmos defaults da classe Bond
+        for param, valores in position_params(self.instruments, n, **kwargs).items():
+            setattr(self, param, valores)
+        
+        # Fluxos de todas as posições em uma única tabela
+        self.table = table if table is not None else \
+                     CashflowTable.from_schedule(val_date, self.maturities, self.annual_coupon,
+                                                 self.coupon_frequency, self.calendar)
+        
+        # Rolagem das datas de início e de fim, conforme Bond.__date_roll__
+        self.val_date   = self.calendar.roll(np.datetime64(val_date, 'D'), roll = 'forward')
+        self.maturities = self.table.vencimentos if self.table.vencimentos is not None else \
+                          self.calendar.roll(self.maturities, roll = 'forward')
+        
+        self.__price__()
+        self.__risks__()
+    
+    @classmethod
+    def from_bonds(cls,
+                   bonds : list) -> 'BondPortfolio':
+        
+        """
+        Constrói o portfólio a partir de objetos Bond já existentes, reaproveitando os seus fluxos
+        
+            Bonds precificados por curva devem compartilhar a mesma yield_curve
+        (cada um com o seu spread), misturar curvas diferentes ou curva e YTM
+        retorna ValueError
+        """
+        
+        curvas = [b.yield_curve if isinstance(b.yield_curve, YieldCurve) else None for b in bonds]
+        if any(c is not curvas[0] for c in curvas):
+            raise ValueError('from_bonds requer a mesma yield_curve em todos os Bonds (ou nenhuma)')
+        
+        table = CashflowTable.from_fluxos([b.fs for b in bonds])
+        
+        portfolio = cls(bonds[0].val_date if bonds else np.datetime64('today', 'D'),
+                        [b.bond_name if b.bond_name in INSTRUMENTOS else 'Bond' for b in bonds],
+                        [b.maturity for b in bonds],
+                        [b.bond_yield for b in bonds],
+                        VNA              = [b.VNA for b in bonds],
+                        quantity         = [b.quantity for b in bonds],
+                        holidays         = bonds[0].calendar if bonds else None,
+                        yield_curve      = curvas[0] if bonds else None,
+                        spread           = [b.spread for b in bonds],
+                        table            = table,
+                        annual_coupon    = [b.annual_coupon for b in bonds],
+                        coupon_frequency = [b.coupon_frequency for b in bonds],
+                        face_value       = [b.face_value for b in bonds],
+                        risk_type        = [b.risk_type for b in bonds])
+        
+        portfolio.val_date = np.array([b.val_date for b in bonds], dtype = 'datetime64[D]')
+        
+        return portfolio
+    
+    def __price__(self):
+        
+        """
+        Método de cálculo do preço de todas as posições (vide Bond.__price__)
+        """
+        
+        t = self.table
+        
+        self.pz = t.dus/252.
+        
+        if isinstance(self.yield_curve, YieldCurve):
+            self.discount_factors = self.yield_curve.discount_factors(t.dus, t.expand(self.spread)) if np.any(self.spread) else \
+                                    self.yield_curve.discount_factors(t.dus)
+        else:
+            self.discount_factors = FlatCurve.discount(t.expand(self.yields), t.dus)
+        
+        self.cotacao    = t.fatores * self.discount_factors
+        self.vp_fatores = t.expand(self.face_value * self.VNA) * self.cotacao
+        self.price      = t.bond_sum(self.vp_fatores)
+        self.portfolio_value = self.price * self.quantity
+    
+    def __risks__(self):
+        
+        """
+        Método de cálculo dos riscos de todas as posições (vide Bond.__risks__)
+        """
+        
+        t = self.table
+        
+        self.duration     = t.bond_sum(self.pz * self.vp_fatores)/self.price
+        self.mod_duration = self.duration/(1. + self.yields)
+        self.dvs          = t.expand(self.mod_duration) * self.vp_fatores / 10000.
+        self.dv01         = -t.bond_sum(self.dvs)
+        self.convexity    = (1. / (1. + self.yields) ** 2.) * t.bond_sum(self.vp_fatores * self.pz * (self.pz + 1.))/self.price
+        
+        # Portfolio
+        self.portfolio_dv01      = self.dv01 * self.quantity
+        self.portfolio_dvs       = self.dvs * t.expand(self.quantity)
+        self.portfolio_convexity = self.convexity * self.quantity
+    
+    def krdv01(self,
+               risk_buckets : Union[dict, None] = None) -> np.ndarray:
+        
+        """
+        Alocação do risco (DVs por fluxo x quantidade) nos buckets, matriz (posições x buckets)
+        
+            Mesmas regras de alocação de Bond.__bucketting__, porém em um único
+        produto esparso sobre todos os fluxos do portfólio, as colunas seguem a
+        ordem crescente dos prazos de risk_buckets (default = RISK_BUCKETS)
+        """
+        
+        pesos = key_rate_weights(risk_buckets if risk_buckets else RISK_BUCKETS)
+        
+        return pesos.allocate(self.table.dus, self.portfolio_dvs, self.table.bond_id, self.table.n_bonds)
+    
+    def aggregates(self) -> dict:
+        
+        """
+        Medidas agregadas do portfólio, durations e convexidade ponderadas pelo valor das posições
+        """
+        
+        valor = self.portfolio_value.sum()
+        
+        return {'Valor'               : valor,
+                'DV01'                : self.portfolio_dv01.sum(),
+                'Duration'            : (self.duration * self.portfolio_value).sum()/valor,
+                'Duration_Modificada' : (self.mod_duration * self.portfolio_value).sum()/valor,
+                'Convexidade'         : (self.convexity * self.portfolio_value).sum()/valor}
+    
+    def to_frame(self) -> pd.DataFrame:
+        
+        """
+        Resultado por posição em formato de DataFrame
+        """
+        
+        return pd.DataFrame({'Instrumento'         : self.instruments,
+                             'Vencimento'          : self.maturities,
+                             'Taxa'                : self.yields,
+                             'VNA'                 : self.VNA,
+                             'Quantidade'          : self.quantity,
+                             'Spread'              : self.spread,
+                             'PU'                  : self.price,
+                             'Duration'            : self.duration,
+                             'Duration_Modificada' : self.mod_duration,
+                             'DV01'                : self.dv01,
+                             'Convexidade'         : self.convexity,
+                             'Valor'               : self.portfolio_value,
+                             'DV01_Portfolio'      : self.portfolio_dv01,
+                             'RiskType'            : self.risk_type})
+    
+    def __len__(self):
+        return len(self.maturities)
+    
+    def __str__(self):
+        return f'BondPortfolio(val_date = {self.val_date}, posicoes = {len(self)}, fluxos = {len(self.table)})'
+    
+    def __repr__(self):
+        return self.__str__()
+
+
+class BondTimeSeries:
+    
+    """
+        Precificação e cálculo de risco de um mesmo título ao longo de várias
+    datas de precificação (histórico de MtM), em uma única passagem
+    
+        Equivalente a construir um Bond para cada data, porém o cronograma de
+    cupons é gerado uma única vez (a partir da primeira data) e os dias úteis
+    de todas as datas para todos os fluxos saem de uma matriz (datas x fluxos)
+    calculada pelo índice acumulado de dias úteis do BusinessCalendar. Em cada
+    data são considerados somente os fluxos posteriores a ela, assim como em
+    Fluxos
+    
+    Variáveis:
+        val_dates  : datas de precificação
+        maturity   : vencimento do título
+        yields     : taxa em cada data (ou única para todas)
+        instrument : 'LTN', 'NTNF', 'NTNB', 'LFT' ou 'Bond', default = 'Bond'
+        VNA        : VNA em cada data (ou único para todas), default = 1
+        holidays   : BusinessCalendar ou lista de feriados, default = HOLIDAY_STORE.calendar
+    
+    **kwargs ACEITOS (sobrepõem os valores de INSTRUMENTOS):
+        - annual_coupon, coupon_frequency, face_value, risk_type
+    
+    """
+    
+    def __init__(self,
+                 val_dates  : Union[list, np.ndarray],
+                 maturity   : Union[str, np.datetime64],
+                 yields     : Union[float, list, np.ndarray],
+                 instrument : str = 'Bond',
+                 VNA        : Union[float, list, np.ndarray] = 1.,
+                 holidays   : Union[BusinessCalendar, list, np.ndarray, None] = None,
+                 **kwargs):
+        
+        self.calendar   = as_calendar(holidays)
+        self.instrument = instrument
+        
+        for param, valor in instrument_params(instrument, **kwargs).items():
+            setattr(self, param, valor)
+        
+        datas = np.atleast_1d(parse_dates(val_dates))
+        n     = len(datas)
+        
+        self.yields = np.broadcast_to(np.asarray(yields, dtype = float), (n,)).copy()
+        self.VNA    = np.broadcast_to(np.asarray(VNA, dtype = float), (n,)).copy()
+        
+        # Cronograma único, a partir da primeira data (datas brutas, antes da rolagem, conforme Fluxos)
+        vencimento = np.datetime64(maturity, 'D')
+        brutos, _  = coupon_schedule(vencimento, self.coupon_frequency, datas.min() if n else vencimento)
+        brutos     = np.sort(brutos)
+        
+        self.cupons   = self.calendar.roll(brutos, roll = 'forward')
+        self.maturity = self.calendar.roll(vencimento, roll = 'forward')
+        
+        valor_cupom  = (1. + self.annual_coupon) ** (1. / self.coupon_frequency) if self.coupon_frequency != 0 else (1. + self.annual_coupon)
+        self.fatores = np.where(self.cupons != self.maturity, valor_cupom - 1., valor_cupom)
+        
+        # Matrizes (datas x fluxos): fluxos ainda não pagos em cada data e seus dias úteis
+        self.ativos = brutos[None, :] > datas[:, None]
+        self.dus    = np.where(self.ativos, self.calendar.busday_count(datas[:, None], self.cupons[None, :]), 0)
+        
+        # Rolagem das datas de precificação, conforme Bond.__date_roll__
+        self.val_dates = self.calendar.roll(datas, roll = 'forward')
+        
+        self.__price__()
+        self.__risks__()
+    
+    def __price__(self):
+        
+        """
+        Método de cálculo do preço em todas as datas (vide Bond.__price__)
+        """
+        
+        self.pz = self.dus / 252.
+        
+        self.discount_factors = FlatCurve.discount(self.yields[:, None], self.dus)
+        self.vp_fatores = np.where(self.ativos, (self.face_value * self.VNA)[:, None] * self.fatores * self.discount_factors, 0.)
+        self.price      = self.vp_fatores.sum(axis = 1)
+    
+    def __risks__(self):
+        
+        """
+        Método de cálculo dos riscos em todas as datas (vide Bond.__risks__)
+        """
+        
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            self.duration     = (self.pz * self.vp_fatores).sum(axis = 1)/self.price
+            self.mod_duration = self.duration/(1. + self.yields)
+            self.dv01         = -self.mod_duration * self.price / 10000.
+            self.convexity    = (1. / (1. + self.yields) ** 2.) * (self.vp_fatores * self.pz * (self.pz + 1.)).sum(axis = 1)/self.price
+    
+    def to_frame(self) -> pd.DataFrame:
+        
+        """
+        Resultado por data em formato de DataFrame
+        """
+        
+        return pd.DataFrame({'Taxa'                : self.yields,
+                             'VNA'                 : self.VNA,
+                             'PU'                  : self.price,
+                             'Duration'            : self.duration,
+                             'Duration_Modificada' : self.mod_duration,
+                             'DV01'                : self.dv01,
+                             'Convexidade'         : self.convexity},
+                            index = pd.Index(self.val_dates, name = 'Data'))
+    
+    def __len__(self):
+        return len(self.val_dates)
+    
+    def __str__(self):
+        return f'BondTimeSeries({self.instrument}|{str(self.maturity).replace("-","")}, datas = {len(self)}, fluxos = {len(self.cupons)})'
+    
+    def __repr__(self):
+        return self.__str__()
+
+
+class RiskAggregator:
+    
+    """
+        Agregador de KRDV01 por RiskType (Nominal, Real, Over) e bucket de risco
+    
+        Substitui o empilhamento de structured_buckets() de cada Bond seguido de
+    pivot_table: as exposições de cada fluxo são alocadas nos buckets (vide
+    KeyRateWeights) e acumuladas com np.add.at em uma matriz pré-alocada
+    (RiskType x bucket), o DataFrame é construído somente em to_frame()
+    
+    Variáveis:
+        risk_buckets : buckets de alocação, default = RISK_BUCKETS
+        risk_types   : RiskTypes iniciais, novos RiskTypes são adicionados conforme aparecem
+    
+    """
+    
+    def __init__(self,
+                 risk_buckets : Union[dict, None] = None,
+                 risk_types   : Union[list, tuple] = ('Nominal', 'Real', 'Over')):
+        
+        self.risk_buckets = risk_buckets if risk_buckets else RISK_BUCKETS
+        self.weights      = key_rate_weights(self.risk_buckets)
+        self.bucket_names = sorted(self.risk_buckets, key = self.risk_buckets.get)
+        self.risk_types   = list(risk_types)
+        
+        self.values = np.zeros((len(self.risk_types), len(self.weights)))
+        self.n_bonds = 0
+    
+    def __type_index__(self,
+                       tipos : np.ndarray) -> np.ndarray:
+        
+        """
+        Índice de cada RiskType na matriz, aumentando a matriz caso surjam RiskTypes novos
+        """
+        
+        unicos, inverso = np.unique(np.asarray(tipos, dtype = str), return_inverse = True)
+        novos = [t for t in unicos if t not in self.risk_types]
+        
+        if novos:
+            self.risk_types += novos
+            self.values = np.vstack([self.values, np.zeros((len(novos), len(self.weights)))])
+        
+        return np.array([self.risk_types.index(t) for t in unicos], dtype = np.int64)[inverso]
+    
+    def __accumulate__(self,
+                       tipos      : np.ndarray,
+                       dus        : np.ndarray,
+                       exposicoes : np.ndarray):
+        
+        """
+        Acumula as exposições de cada fluxo (com o RiskType do fluxo) na matriz
+        """
+        
+        if not len(dus): return
+        
+        indices, pesos = self.weights.__lookup__(dus)
+        linhas = np.broadcast_to(self.__type_index__(tipos)[:, None], indices.shape)
+        
+        np.add.at(self.values, (linhas, indices), pesos * np.asarray(exposicoes, dtype = float)[:, None])
+    
+    def add(self,
+            bond : Bond) -> 'RiskAggregator':
+        
+        """
+        Adiciona um Bond, risco = DVs de cada fluxo x quantidade (vide Bond.__bucketting__)
+        """
+        
+        return self.extend([bond])
+    
+    def extend(self,
+               bonds : list) -> 'RiskAggregator':
+        
+        """
+        Adiciona uma lista de Bonds em uma única acumulação
+        """
+        
+        bonds = list(bonds)
+        if not bonds: return self
+        
+        tamanhos = [len(b.dus) for b in bonds]
+        
+        self.__accumulate__(np.repeat([b.risk_type for b in bonds], tamanhos),
+                            np.concatenate([np.asarray(b.dus) for b in bonds]),
+                            np.concatenate([np.asarray(b.dvs) * b.quantity for b in bonds]))
+        self.n_bonds += len(bonds)
+        
+        return self
+    
+    def add_portfolio(self,
+                      portfolio : BondPortfolio) -> 'RiskAggregator':
+        
+        """
+        Adiciona todas as posições de um BondPortfolio, sem construir nenhum Bond
+        """
+        
+        t = portfolio.table
+        
+        self.__accumulate__(portfolio.risk_type[t.bond_id], t.dus, portfolio.portfolio_dvs)
+        self.n_bonds += len(portfolio)
+        
+        return self
+    
+    def clear(self):
+        self.values[:] = 0.
+        self.n_bonds = 0
+    
+    def to_frame(self,
+                 todos : bool = False) -> pd.DataFrame:
+        
+        """
+        KRDV01 agregado (buckets x RiskType), equivalente ao pivot_table de structured_buckets()
+        
+            Por padrão somente os RiskTypes com alguma exposição são retornados,
+        todos = True retorna todas as colunas
+        """
+        
+        colunas = [i for i, t in enumerate(self.risk_types) if todos or self.values[i].any()]
+        
+        df = pd.DataFrame(self.values[colunas].T,
+                          index   = self.bucket_names,
+                          columns = [self.risk_types[i] for i in colunas])
+        df.columns.name = 'RiskType'
+        
+        return df
+    
+    def __str__(self):
+        return f'RiskAggregator(bonds = {self.n_bonds}, buckets = {len(self.weights)}, risk_types = {self.risk_types})'
+    
+    def __repr__(self):
+        return self.__str__()
+
+
+class TickRepricer:
+    
+    """
+        Reprecificação incremental de um livro de títulos a partir de ticks de
+    taxa e/ou VNA de títulos individuais
+    
+        O cronograma, os expoentes de desconto (du/252) e os pesos de alocação
+    nos buckets (KeyRateWeights) de cada título são guardados uma única vez,
+    cada tick recalcula somente o título afetado e atualiza os totais do
+    livro (valor, DV01 e KRDV01) pela diferença, de forma que o custo por
+    tick depende apenas do número de fluxos do título, não do tamanho do livro
+    
+        Os totais acumulam erros de arredondamento a cada diferença aplicada,
+    resync() os recalcula a partir dos valores por título
+    
+    Variáveis:
+        portfolio    : BondPortfolio (precificado por YTM) ou lista de Bonds
+        keys         : identificador de cada posição nos ticks, default = índice da posição
+        risk_buckets : buckets de alocação do KRDV01, default = RISK_BUCKETS
+    
+    """
+    
+    def __init__(self,
+                 portfolio    : Union['BondPortfolio', list],
+                 keys         : Union[list, None] = None,
+                 risk_buckets : Union[dict, None] = None):
+        
+        if not isinstance(portfolio, BondPortfolio): portfolio = BondPortfolio.from_bonds(list(portfolio))
+        
+        if isinstance(portfolio.yield_curve, YieldCurve):
+            raise ValueError('TickRepricer requer um portfólio precificado por taxa (yield_curve = None)')
+        
+        t = portfolio.table
+        n = t.n_bonds
+        
+        self.keys    = list(range(n)) if keys is None else list(keys)
+        self.indices = {k : i for i, k in enumerate(self.keys)}
+        
+        if len(self.indices) != n: raise ValueError('keys deve ter um identificador único por posição')
+        
+        self.offsets      = t.offsets
+        self.pz           = t.dus / 252.
+        self.fatores      = t.fatores * t.expand(portfolio.face_value)
+        self.risk_buckets = risk_buckets if risk_buckets else RISK_BUCKETS
+        self.buckets      = sorted(self.risk_buckets, key = self.risk_buckets.get)
+        
+        pesos = key_rate_weights(self.risk_buckets)
+        self.bucket_indices, self.bucket_weights = pesos.__lookup__(t.dus)
+        self.n_buckets = len(pesos)
+        
+        # Estado por título
+        self.yields    = portfolio.yields.copy()
+        self.VNA       = portfolio.VNA.copy()
+        self.quantity  = portfolio.quantity.copy()
+        self.price     = portfolio.price.copy()
+        self.dv01      = portfolio.dv01.copy()
+        self.krdv01    = portfolio.krdv01(self.risk_buckets)
+        self.n_ticks   = 0
+        
+        self.resync()
+    
+    def resync(self):
+        
+        """
+        Recalcula os totais do livro a partir dos valores por título
+        """
+        
+        self.book_value  = float((self.price * self.quantity).sum())
+        self.book_dv01   = float((self.dv01 * self.quantity).sum())
+        self.book_krdv01 = self.krdv01.sum(axis = 0)
+    
+    def __reprice__(self,
+                    i : int) -> tuple:
+        
+        """
+        Preço, DV01 e linha de KRDV01 (x quantidade) do título i, somente com os seus fluxos
+        """
+        
+        sl = slice(self.offsets[i], self.offsets[i + 1])
+        y, pz = self.yields[i], self.pz[sl]
+        
+        vp    = self.VNA[i] * self.fatores[sl] * (1. + y) ** -pz
+        price = vp.sum()
+        
+        # Mesmas fórmulas de Bond.__risks__
+        mod_duration = (pz * vp).sum() / price / (1. + y)
+        dvs          = mod_duration * vp / 10000.
+        
+        krdv01 = np.bincount(self.bucket_indices[sl].ravel(),
+                             weights = (self.bucket_weights[sl] * (dvs * self.quantity[i])[:, None]).ravel(),
+                             minlength = self.n_buckets)
+        
+        return price, -dvs.sum(), krdv01
+    
+    def update(self,
+               key,
+               bond_yield : Union[float, None] = None,
+               VNA        : Union[float, None] = None) -> dict:
+        
+        """
+        Aplica uma nova taxa e/ou VNA a uma posição e atualiza os totais do livro pela diferença
+        """
+        
+        i = self.indices[key]
+        
+        if bond_yield is not None: self.yields[i] = bond_yield
+        if VNA is not None: self.VNA[i] = VNA
+        
+        price, dv01, krdv01 = self.__reprice__(i)
+        q = self.quantity[i]
+        
+        self.book_value  += (price - self.price[i]) * q
+        self.book_dv01   += (dv01 - self.dv01[i]) * q
+        self.book_krdv01 += krdv01 - self.krdv01[i]
+        
+        self.price[i], self.dv01[i], self.krdv01[i] = price, dv01, krdv01
+        self.n_ticks += 1
+        
+        return {'key'         : key,
+                'price'       : price,
+                'dv01'        : dv01,
+                'book_value'  : self.book_value,
+                'book_dv01'   : self.book_dv01}
+    
+    def stream(self,
+               ticks : Iterable) -> Iterator[dict]:
+        
+        """
+        Consome um iterador/gerador de ticks, retornando (gerador) o resultado de cada tick
+        
+            Cada tick pode ser (key, bond_yield), (key, bond_yield, VNA) ou um
+        dict com 'key' e 'bond_yield' e/ou 'VNA'
+        """
+        
+        for tick in ticks:
+            yield self.update(**tick) if isinstance(tick, dict) else self.update(*tick)
+    
+    def consume(self,
+                ticks : Iterable) -> dict:
+        
+        """
+        Aplica todos os ticks e retorna os totais do livro
+        """
+        
+        for _ in self.stream(ticks): pass
+        
+        return self.totals()
+    
+    def totals(self) -> dict:
+        return {'Valor'  : self.book_value,
+                'DV01'   : self.book_dv01,
+                'KRDV01' : dict(zip(self.buckets, self.book_krdv01))}
+    
+    def __len__(self):
+        return len(self.keys)
+    
+    def __str__(self):
+        return f'TickRepricer(posicoes = {len(self)}, ticks = {self.n_ticks}, valor = {self.book_value:.2f}, dv01 = {self.book_dv01:.4f})'
+    
+    def __repr__(self):
+        return self.__str__()
+
+
+class ScenarioEngine:
+    
+    """
+        Reprecificação completa de um portfólio sob um conjunto de cenários de
+    choque de taxas, sem construir nenhum objeto por cenário
+    
+        Os fluxos já estão dispostos no CashflowTable do portfólio, cada lote
+    de cenários é uma matriz (cenários x fluxos) de fatores de desconto,
+    somada por título em uma única passagem (CashflowTable.bond_sum)
+    
+        - sem curva, os choques (vetor de cenários) são somados à taxa de cada título (YTM)
+        - com FlatForward, os choques (cenários x vértices, ou vetor de choques
+          paralelos) são somados às taxas dos vértices e as curvas chocadas são
+          interpoladas nos fluxos pelos pesos lineares do flat forward
+          (FlatForward.interpolation_weights), calculados uma única vez por
+          versão da curva (refeitos, com os preços base, após FlatForward.update)
+        - com outra YieldCurve, os choques (vetor) são somados à taxa da curva em cada fluxo
+    
+    Variáveis:
+        portfolio   : BondPortfolio ou lista de Bonds
+        yield_curve : YieldCurve, default = yield_curve do portfólio
+        chunk_size  : máximo de elementos (cenários x fluxos) mantidos em memória por lote
+    
+    """
+    
+    def __init__(self,
+                 portfolio   : Union['BondPortfolio', list],
+                 yield_curve : Union[YieldCurve, None] = None,
+                 chunk_size  : int = 4_000_000):
+        
+        if not isinstance(portfolio, BondPortfolio): portfolio = BondPortfolio.from_bonds(list(portfolio))
+        
+        self.portfolio   = portfolio
+        self.yield_curve = yield_curve if yield_curve is not None else portfolio.yield_curve
+        self.chunk_size  = chunk_size
+        
+        t = portfolio.table
+        self.table = t
+        self.pz    = t.dus / (self.yield_curve.days_year if isinstance(self.yield_curve, YieldCurve) else 252.)
+        self.vf    = t.fatores * t.expand(portfolio.face_value * portfolio.VNA)
+        
+        # Spread de cada posição sobre a curva (vide BondPortfolio.__price__)
+        self.spreads = t.expand(portfolio.spread) if isinstance(self.yield_curve, YieldCurve) else np.zeros(len(t))
+        
+        self.__update_curve__()
+    
+    def __update_curve__(self):
+        
+        """
+        Pesos de interpolação (ou taxas) e preços base, recalculados somente quando a curva for atualizada
+        """
+        
+        t = self.table
+        
+        if isinstance(self.yield_curve, FlatForward):
+            self.weights = self.yield_curve.interpolation_weights(t.dus)
+        elif isinstance(self.yield_curve, YieldCurve):
+            self.base_rates = self.yield_curve(t.dus.astype(float)) + self.spreads
+        else:
+            self.base_rates = t.expand(self.portfolio.yields)
+        
+        self.curve_version = self.yield_curve.version if isinstance(self.yield_curve, YieldCurve) else None
+        self.base_prices   = self.__prices__(np.zeros((1, 1)))[0]
+    
+    def __shocks__(self,
+                   shocks : Union[float, list, np.ndarray]) -> np.ndarray:
+        
+        """
+        Normaliza os choques para uma matriz (cenários x vértices), vértices = 1 para choques paralelos
+        """
+        
+        shocks = np.asarray(shocks, dtype = float)
+        shocks = shocks[:, None] if shocks.ndim == 1 else np.atleast_2d(shocks)
+        
+        if shocks.shape[1] != 1:
+            if not isinstance(self.yield_curve, FlatForward):
+                raise ValueError('Choques por vértice (cenários x vértices) requerem uma yield_curve FlatForward')
+            if shocks.shape[1] != len(self.yield_curve.maturities):
+                raise ValueError(f'Choques têm {shocks.shape[1]} vértices enquanto a curva tem {len(self.yield_curve.maturities)}')
+        
+        return shocks
+    
+    def __prices__(self,
+                   shocks : np.ndarray) -> np.ndarray:
+        
+        """
+        Preços (cenários x títulos) para uma matriz de choques já normalizada, calculados em lotes de cenários
+        """
+        
+        n_fluxos = max(1, len(self.pz))
+        passo    = max(1, self.chunk_size // n_fluxos)
+        precos   = np.empty((len(shocks), self.table.n_bonds))
+        
+        for i in range(0, len(shocks), passo):
+            
+            lote = shocks[i : i + passo]
+            
+            if isinstance(self.yield_curve, FlatForward):
+                curva = self.yield_curve
+                left, right, w_left, w_right = self.weights
+                log_vertices = curva.maturities / curva.days_year * np.log1p(curva.yields + lote)
+                log_fatores  = log_vertices[:, left] * w_left + log_vertices[:, right] * w_right
+                
+                if np.any(self.spreads):
+                    # Spread somado às taxas interpoladas, conforme FlatForward.discount_factors
+                    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+                        taxas = np.expm1(log_fatores / self.pz)
+                    fatores = np.where(self.pz > 0, (1. + taxas + self.spreads) ** -self.pz, 1.)
+                else:
+                    fatores = np.exp(-log_fatores)
+            else:
+                fatores = (1. + self.base_rates + lote) ** -self.pz
+            
+            precos[i : i + passo] = self.table.bond_sum(self.vf * fatores)
+        
+        return precos
+    
+    def __call__(self,
+                 shocks : Union[float, list, np.ndarray]) -> dict:
+        
+        """
+        Reprecificação para os choques fornecidos (em taxa, 0.01 = 1%)
+        
+        Retorna dict com:
+            - prices        : preços unitários (cenários x títulos)
+            - pnl           : P&L de cada posição (cenários x títulos), (preço - preço base) x quantidade
+            - portfolio_pnl : P&L total do portfólio por cenário
+        """
+        
+        # Curva atualizada (FlatForward.update) após a construção: pesos e preços base refeitos
+        if isinstance(self.yield_curve, YieldCurve) and self.yield_curve.version != self.curve_version: self.__update_curve__()
+        
+        precos = self.__prices__(self.__shocks__(shocks))
+        pnl    = (precos - self.base_prices) * self.portfolio.quantity
+        
+        return {'prices'        : precos,
+                'pnl'           : pnl,
+                'portfolio_pnl' : pnl.sum(axis = 1)}
+    
+    def __str__(self):
+        return f'ScenarioEngine(posicoes = {self.table.n_bonds}, fluxos = {len(self.table)}, curva = {type(self.yield_curve).__name__})'
+    
+    def __repr__(self):
+        return self.__str__()
+
+
+class CarryRollEngine:
+    
+    """
+        Carry e roll-down de um portfólio para uma grade de horizontes (em dias
+    úteis), calculados em uma única passagem com broadcast (horizontes x
+    fluxos) sobre o CashflowTable do portfólio
+    
+        Para cada horizonte h, os fluxos com du <= h são recebidos (cupons
+    recebidos, sem reinvestimento) e os demais passam a vencer em du - h:
+        - carry     : preço em h mantendo a taxa (YTM) do título + cupons recebidos - preço atual
+        - roll_down : preço em h na curva estática (mesmo z-spread de hoje) - preço em h mantendo a taxa
+        - total     : carry + roll_down
+    
+        A taxa e o z-spread de cada título são resolvidos (_newton_rates) a
+    partir do preço atual, de forma que em h = 0 carry e roll-down são nulos
+    (o z-spread é resolvido novamente quando a curva for atualizada)
+    
+    Variáveis:
+        portfolio   : BondPortfolio ou lista de Bonds
+        yield_curve : YieldCurve, default = yield_curve do portfólio
+    
+    """
+    
+    def __init__(self,
+                 portfolio   : Union['BondPortfolio', list],
+                 yield_curve : Union[YieldCurve, None] = None):
+        
+        if not isinstance(portfolio, BondPortfolio): portfolio = BondPortfolio.from_bonds(list(portfolio))
+        
+        self.portfolio   = portfolio
+        self.yield_curve = yield_curve if yield_curve is not None else portfolio.yield_curve
+        
+        if not isinstance(self.yield_curve, YieldCurve):
+            raise ValueError('Forneça uma yield_curve para o cálculo de roll-down')
+        
+        t = portfolio.table
+        self.table    = t
+        self.notional = portfolio.face_value * portfolio.VNA
+        self.vf       = t.fatores * t.expand(self.notional)
+        
+        # Taxa e z-spread consistentes com o preço atual de cada posição
+        self.yields  = _newton_rates(t, self.notional, portfolio.price, portfolio.yields)['rates']
+        self.__update_spreads__()
+    
+    def __update_spreads__(self):
+        
+        """
+        Z-spread de cada posição sobre a curva, resolvido novamente somente quando a curva for atualizada
+        """
+        
+        t = self.table
+        
+        self.spreads = _newton_rates(t, self.notional, self.portfolio.price, 0.,
+                                     base_rates = self.yield_curve(t.dus.astype(float)),
+                                     days_year = self.yield_curve.days_year)['rates']
+        self.curve_version = self.yield_curve.version
+    
+    def __call__(self,
+                 horizons : Union[int, list, np.ndarray]) -> dict:
+        
+        """
+        Carry e roll-down para os horizontes fornecidos, em dias úteis
+        
+        Retorna dict com arrays (horizontes x títulos), por unidade de cada título:
+            - carry, roll_down, total
+            - coupons     : fluxos recebidos até o horizonte
+            - price_carry : preço no horizonte mantendo a taxa do título
+            - price_roll  : preço no horizonte na curva estática
+        e também horizons e dates (data de cada horizonte, horizontes x títulos)
+        """
+        
+        # Curva atualizada (FlatForward.update) após a construção: z-spreads resolvidos na curva atual
+        if self.yield_curve.version != self.curve_version: self.__update_spreads__()
+        
+        t = self.table
+        h = np.atleast_1d(np.asarray(horizons, dtype = np.int64))
+        
+        restantes = t.dus[None, :] - h[:, None]
+        recebidos = restantes <= 0
+        
+        # Prazo dos fluxos já recebidos substituído pelo prazo atual, somente para manter a interpolação válida
+        prazos = np.where(recebidos, t.dus[None, :], restantes)
+        pz     = prazos / self.yield_curve.days_year
+        
+        taxas_curva = self.yield_curve(prazos.ravel().astype(float)).reshape(prazos.shape)
+        
+        vp_carry = np.where(recebidos, 0., self.vf * (1. + t.expand(self.yields)) ** -(prazos / 252.))
+        vp_roll  = np.where(recebidos, 0., self.vf * (1. + taxas_curva + t.expand(self.spreads)) ** -pz)
+        cupons   = np.where(recebidos, self.vf, 0.)
+        
+        preco_carry = t.bond_sum(vp_carry)
+        preco_roll  = t.bond_sum(vp_roll)
+        recebido    = t.bond_sum(cupons)
+        
+        carry     = preco_carry + recebido - self.portfolio.price
+        roll_down = preco_roll - preco_carry
+        
+        # val_date comum ou por posição (from_bonds), datas no mesmo formato (horizontes x títulos) dos demais arrays
+        datas = np.broadcast_to(np.asarray(self.portfolio.val_date, dtype = 'datetime64[D]'), (t.n_bonds,))
+        
+        return {'horizons'    : h,
+                'dates'       : self.portfolio.calendar.busday_offset(datas[None, :], h[:, None]),
+                'carry'       : carry,
+                'roll_down'   : roll_down,
+                'total'       : carry + roll_down,
+                'coupons'     : recebido,
+                'price_carry' : preco_carry,
+                'price_roll'  : preco_roll}
+    
+    def __str__(self):
+        return f'CarryRollEngine(posicoes = {self.table.n_bonds}, fluxos = {len(self.table)}, curva = {type(self.yield_curve).__name__})'
+    
+    def __repr__(self):
+        return self.__str__()
+
+
+def bootstrap_curve(val_date    : Union[str, np.datetime64],
+                    maturities  : Union[list, np.ndarray],
+                    prices      : Union[list, np.ndarray],
+                    instruments : Union[str, list, np.ndarray] = 'LTN',
+                    holidays    : Union[BusinessCalendar, list, np.ndarray, None] = None,
+                    days_year   : int   = 252,
+                    extrapolate : bool  = True,
+                    precision   : float = 1e-10,
+                    max_iter    : int   = 100) -> FlatForward:
+    
+    """
+    Bootstrap de curva pré (FlatForward) a partir de preços de LTN e NTN-F
+    
+        Os vértices são resolvidos em ordem de vencimento. Para cada título, os
+    fluxos anteriores ao último vértice já resolvido são descontados de uma só
+    vez pela curva parcial e somente o fator de desconto do novo vértice é
+    resolvido (Newton-Raphson em log do fator de desconto), de forma que o
+    título precificado com yield_curve = curva resultante reproduz o preço
+    fornecido
+    
+    Parâmetros
+    ----------
+    val_date : str ou np.datetime64
+        Data de precificação comum a todos os títulos.
+    maturities : list ou np.ndarray
+        Vencimentos dos títulos.
+    prices : list ou np.ndarray
+        PU de cada título.
+    instruments : str, list ou np.ndarray, optional
+        Tipo de cada título ('LTN' ou 'NTNF', outros códigos retornam ValueError). The default is 'LTN'.
+    holidays : BusinessCalendar ou lista de feriados, optional
+        Calendário utilizado. The default is HOLIDAY_STORE.calendar.
+    precision : float, optional
+        Precisão, em reais, do preço de cada título. The default is 1e-10.
+    max_iter : int, optional
+        Máximo de iterações por vértice, sem convergência retorna ValueError. The default is 100.
+    
+    Resposta
+    --------
+    FlatForward
+        Curva com um vértice (em dias úteis) no vencimento de cada título.
+    """
+    
+    maturities  = np.atleast_1d(np.asarray(maturities, dtype = 'datetime64[D]'))
+    prices      = np.broadcast_to(np.asarray(prices, dtype = float), maturities.shape)
+    instruments = np.broadcast_to(np.asarray(instruments), maturities.shape)
+    
+    # Curva pré (nominal): somente LTN e NTN-F
+    invalidos = sorted(set(map(str, instruments)) - {'LTN', 'NTNF'})
+    if invalidos:
+        raise ValueError(f'bootstrap_curve aceita somente LTN e NTNF, recebido {invalidos}')
+    
+    specs = [instrument_params(inst) for inst in instruments]
+    face  = np.array([spec['face_value'] for spec in specs])
+    
+    fs = fluxos_vetorizados(val_date, maturities,
+                            [spec['annual_coupon'] for spec in specs],
+                            [spec['coupon_frequency'] for spec in specs],
+                            holidays)
+    
+    offsets = fs['offsets']
+    
+    # Vértices resolvidos, partindo da origem (log do fator de desconto = 0 em du = 0)
+    vert_dus, vert_lfs = [0.], [0.]
+    
+    for i in np.argsort(fs['du'][offsets[1:] - 1], kind = 'stable'):
+        
+        dus = fs['du'][offsets[i] : offsets[i + 1]].astype(float)
+        cfs = face[i] * fs['fator'][offsets[i] : offsets[i + 1]]
+        mat = dus[-1]
+        
+        if mat <= vert_dus[-1]:
+            raise ValueError(f'Vencimento {maturities[i]} repetido ou anterior ao último vértice resolvido')
+        
+        # Fluxos já cobertos pela curva parcial são descontados de forma vetorizada
+        conhecidos = dus <= vert_dus[-1]
+        residual   = prices[i] - np.sum(cfs[conhecidos] * np.exp(-np.interp(dus[conhecidos], vert_dus, vert_lfs)))
+        
+        if residual <= 0:
+            raise ValueError(f'Preço {prices[i]} do vencimento {maturities[i]} é inconsistente com os vértices anteriores')
+        
+        # Fluxos novos : log fator = lf_ant * (1 - w) + lf_novo * w
+        w   = (dus[~conhecidos] - vert_dus[-1]) / (mat - vert_dus[-1])
+        cfn = cfs[~conhecidos]
+        
+        lf, it = mat / days_year * np.log1p(.1), 0
+        erro   = np.inf
+        
+        while abs(erro) > precision and it < max_iter:
+            pv   = cfn * np.exp(-(vert_lfs[-1] * (1. - w) + lf * w))
+            erro = np.sum(pv) - residual
+            lf  += erro / np.sum(pv * w)
+            it  += 1
+        
+        if not abs(erro) <= precision:
+            raise ValueError(f'Newton-Raphson não convergiu para o vencimento {maturities[i]} em {it} iterações (erro = {erro:.3e})')
+        
+        vert_dus.append(mat)
+        vert_lfs.append(lf)
+    
+    vert_dus, vert_lfs = np.array(vert_dus[1:]), np.array(vert_lfs[1:])
+    
+    return FlatForward(vert_dus,
+                       np.expm1(vert_lfs * days_year / vert_dus),
+                       days_year   = days_year,
+                       extrapolate = extrapolate)
@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+"""
+Author : Milton Rocha
+Medium : https://medium.com/@milton-rocha
+"""
+
+import asyncio
+import json
+import time
+import numpy as np
+
+from typing import Union
+
+from date_utils import (BusinessCalendar,
+                        as_calendar)
+from pricer     import (BondPortfolio,
+                        instrument_params)
+
+
+class PricingService:
+
+    """
+        Serviço local de precificação (asyncio, somente biblioteca padrão) que
+    agrupa requisições concorrentes em micro-lotes
+
+        Cada requisição entra em uma fila, o loop de lotes espera a primeira
+    requisição e continua coletando até max_batch requisições ou até
+    max_wait_ms milissegundos. O lote é precificado por um BondPortfolio por
+    data de precificação (caminho vetorizado) e o resultado de cada posição é
+    devolvido à sua requisição
+
+    Protocolo (TCP, um JSON por linha, respostas na mesma conexão):
+        requisição : {"id" : 1, "instrument" : "NTNF", "val_date" : "2022-07-29",
+                      "maturity" : "2033-01-01", "yield" : 0.12, "VNA" : 1, "quantity" : 1}
+        resposta   : {"id" : 1, "price" : ..., "duration" : ..., "mod_duration" : ...,
+                      "dv01" : ..., "convexity" : ...} ou {"id" : 1, "error" : "..."}
+        métricas   : {"op" : "metrics"}
+
+    Variáveis:
+        host, port  : endereço do servidor, default = 127.0.0.1:8765
+        max_batch   : tamanho máximo de cada lote
+        max_wait_ms : tempo máximo, em milissegundos, de espera para completar um lote
+        holidays    : BusinessCalendar ou lista de feriados, default = HOLIDAY_STORE.calendar
+
+    """
+
+    def __init__(self,
+                 host        : str = '127.0.0.1',
+                 port        : int = 8765,
+                 max_batch   : int = 256,
+                 max_wait_ms : float = 2.,
+                 holidays    : Union[BusinessCalendar, list, np.ndarray, None] = None):
+
+        self.host        = host
+        self.port        = port
+        self.max_batch   = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.calendar    = as_calendar(holidays)
+
+        self.queue    = None
+        self.server   = None
+        self.__tarefa = None
+
+        self.__metricas = {'requests' : 0, 'batches' : 0, 'errors' : 0,
+                           'batch_size_max' : 0, 'last_batch_size' : 0, 'batch_ms_total' : 0.}
+
+    # Precificação -----------------------------------------------------------
+
+    @staticmethod
+    def __parse__(req : dict) -> tuple:
+
+        """
+        Valida uma requisição, retorna (val_date, instrumento, vencimento, taxa, VNA, quantidade)
+
+        Erros de validação (TypeError, KeyError, ValueError) afetam somente a própria requisição
+        """
+
+        if not isinstance(req, dict):
+            raise TypeError(f'requisição deve ser um objeto JSON (dict), recebido {type(req).__name__}')
+
+        instrumento = str(req.get('instrument', 'Bond'))
+        instrument_params(instrumento)
+
+        val_date   = np.datetime64(req['val_date'], 'D')
+        vencimento = np.datetime64(req['maturity'], 'D')
+
+        # None (ou 'NaT') seria aceito pelo numpy como NaT e só falharia na precificação
+        for campo, data in (('val_date', val_date), ('maturity', vencimento)):
+            if np.isnat(data): raise ValueError(f'{campo} inválido: {req[campo]!r}')
+
+        return (str(val_date),
+                instrumento,
+                vencimento,
+                float(req['yield']),
+                float(req.get('VNA', 1.)),
+                float(req.get('quantity', 1.)))
+
+    def price_batch(self,
+                    requests : list) -> list:
+
+        """
+        Precifica um lote de requisições (síncrono), uma resposta por requisição, na mesma ordem
+        """
+
+        respostas = [None] * len(requests)
+        grupos    = {}
+
+        for i, req in enumerate(requests):
+            try:
+                pos = self.__parse__(req)
+                grupos.setdefault(pos[0], []).append((i, pos))
+            except (KeyError, TypeError, ValueError) as e:
+                respostas[i] = {'id' : req.get('id') if isinstance(req, dict) else None, 'error' : f'requisição inválida: {type(e).__name__}: {e}'}
+
+        for val_date, posicoes in grupos.items():
+            try:
+                self.__price_group__(val_date, posicoes, requests, respostas)
+            except Exception:
+                # Caso o lote falhe, cada posição é precificada isoladamente para isolar o erro
+                for i, pos in posicoes:
+                    try:
+                        self.__price_group__(val_date, [(i, pos)], requests, respostas)
+                    except Exception as e:
+                        respostas[i] = {'id' : requests[i].get('id'), 'error' : f'{type(e).__name__}: {e}'}
+
+        return respostas
+
+    def __price_group__(self,
+                        val_date  : str,
+                        posicoes  : list,
+                        requests  : list,
+                        respostas : list):
+
+        indices, pos = zip(*posicoes)
+        _, instrumentos, vencimentos, taxas, vnas, quantidades = zip(*pos)
+
+        p = BondPortfolio(val_date, list(instrumentos), np.array(vencimentos), list(taxas),
+                          VNA = list(vnas), quantity = list(quantidades), holidays = self.calendar)
+
+        for k, i in enumerate(indices):
+            respostas[i] = {'id'           : requests[i].get('id'),
+                            'price'        : float(p.price[k]),
+                            'duration'     : float(p.duration[k]),
+                            'mod_duration' : float(p.mod_duration[k]),
+                            'dv01'         : float(p.dv01[k]),
+                            'convexity'    : float(p.convexity[k])}
+
+    # Micro-lotes ------------------------------------------------------------
+
+    async def price(self,
+                    request : dict) -> dict:
+
+        """
+        Enfileira uma requisição e aguarda a sua resposta (uso no próprio processo ou pelo servidor)
+        """
+
+        if self.queue is None: await self.start_batcher()
+
+        futuro = asyncio.get_running_loop().create_future()
+        await self.queue.put((request, futuro))
+
+        return await futuro
+
+    async def start_batcher(self):
+
+        if self.queue is None: self.queue = asyncio.Queue()
+        if self.__tarefa is None: self.__tarefa = asyncio.create_task(self.__batcher__())
+
+    async def __batcher__(self):
+
+        loop = asyncio.get_running_loop()
+
+        while True:
+
+            lote = [await self.queue.get()]
+            limite = loop.time() + self.max_wait_ms / 1000.
+
+            while len(lote) < self.max_batch:
+                espera = limite - loop.time()
+                if espera <= 0: break
+                try:
+                    lote.append(await asyncio.wait_for(self.queue.get(), espera))
+                except asyncio.TimeoutError:
+                    break
+
+            requisicoes = [req for req, _ in lote]
+
+            inicio = time.perf_counter()
+            try:
+                # Precificação fora do loop de eventos, para não bloquear o recebimento de requisições
+                respostas = await loop.run_in_executor(None, self.price_batch, requisicoes)
+            except Exception as e:
+                respostas = [{'id' : req.get('id') if isinstance(req, dict) else None, 'error' : repr(e)} for req in requisicoes]
+
+            m = self.__metricas
+            m['requests']        += len(lote)
+            m['batches']         += 1
+            m['errors']          += sum('error' in r for r in respostas)
+            m['last_batch_size']  = len(lote)
+            m['batch_size_max']   = max(m['batch_size_max'], len(lote))
+            m['batch_ms_total']  += (time.perf_counter() - inicio) * 1000.
+
+            for (_, futuro), resposta in zip(lote, respostas):
+                if not futuro.done(): futuro.set_result(resposta)
+
+    def metrics(self) -> dict:
+
+        """
+        Métricas do serviço: profundidade da fila, requisições, lotes e tamanhos de lote
+        """
+
+        m = self.__metricas
+
+        return {'queue_depth'     : self.queue.qsize() if self.queue is not None else 0,
+                'requests'        : m['requests'],
+                'batches'         : m['batches'],
+                'errors'          : m['errors'],
+                'last_batch_size' : m['last_batch_size'],
+                'batch_size_max'  : m['batch_size_max'],
+                'batch_size_mean' : m['requests'] / m['batches'] if m['batches'] else 0.,
+                'batch_ms_mean'   : m['batch_ms_total'] / m['batches'] if m['batches'] else 0.}
+
+    # Servidor TCP -----------------------------------------------------------
+
+    async def __handle__(self,
+                         reader : asyncio.StreamReader,
+                         writer : asyncio.StreamWriter):
+
+        """
+        Conexão de um cliente: cada linha é tratada de forma concorrente, respostas escritas conforme ficam prontas
+        """
+
+        pendentes = set()
+
+        async def __responde__(linha : bytes):
+
+            try:
+                req = json.loads(linha)
+                resposta = self.metrics() if isinstance(req, dict) and req.get('op') == 'metrics' else \
+                           await self.price(req)
+            except json.JSONDecodeError as e:
+                resposta = {'id' : None, 'error' : f'JSON inválido: {e}'}
+
+            writer.write(json.dumps(resposta).encode() + b'\n')
+            await writer.drain()
+
+        try:
+            while linha := await reader.readline():
+                if not linha.strip(): continue
+                tarefa = asyncio.create_task(__responde__(linha))
+                pendentes.add(tarefa)
+                tarefa.add_done_callback(pendentes.discard)
+
+            if pendentes: await asyncio.gather(*pendentes, return_exceptions = True)
+        finally:
+            writer.close()
+
+    async def start(self):
+
+        """
+        Inicia o loop de lotes e o servidor TCP
+        """
+
+        await self.start_batcher()
+        self.server = await asyncio.start_server(self.__handle__, self.host, self.port)
+
+        return self.server
+
+    async def serve_forever(self):
+
+        if self.server is None: await self.start()
+
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+        if self.__tarefa is not None:
+            self.__tarefa.cancel()
+            try:
+                await self.__tarefa
+            except asyncio.CancelledError:
+                pass
+            self.__tarefa = None
+
+    def __str__(self):
+        return f'PricingService({self.host}:{self.port}, max_batch = {self.max_batch}, max_wait_ms = {self.max_wait_ms})'
+
+    def __repr__(self):
+        return self.__str__()
+
+
+if __name__ == '__main__':
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description = 'Serviço local de precificação em micro-lotes')
+    parser.add_argument('--host', default = '127.0.0.1')
+    parser.add_argument('--port', type = int, default = 8765)
+    parser.add_argument('--max-batch', type = int, default = 256)
+    parser.add_argument('--max-wait-ms', type = float, default = 2.)
+    args = parser.parse_args()
+
+    servico = PricingService(args.host, args.port, args.max_batch, args.max_wait_ms)
+    print(servico)
+
+    asyncio.run(servico.serve_forever())
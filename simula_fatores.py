@@ -1,12 +1,12 @@
-from date_utils import feriados
-
-holidays = feriados()
+from date_utils import (BusinessCalendar,
+                        as_calendar)
 
 from markov_transition_matrix import TransitionMatrixCOPOM, get_copom
 
 import numpy  as np
 import pandas as pd
 from itertools import product as _iter_product
+from typing    import Union
 
 class SimulaCenariosDI:
     
@@ -37,7 +37,7 @@ class SimulaCenariosDI:
                  di_over    : float,
                  val_date   : str,
                  copom      : list,
-                 holidays   : list = holidays,
+                 holidays   : Union[BusinessCalendar, list, None] = None,
                  **kwargs):
         
         self.di_over  = di_over
@@ -45,6 +45,7 @@ class SimulaCenariosDI:
         self.val_date = val_date
         self.copom    = copom
         self.holidays = holidays
+        self.calendar = as_calendar(holidays)
         
         # Caso esteja definido como download_probabilities = True, baixará
         self.download_probabilities = kwargs.get('download_probabilities', False)
@@ -155,9 +156,8 @@ class SimulaCenariosDI:
         _f = 1.
         
         # Calcula a quantidade de dias úteis até cada COPOM
-        dus = np.busday_count(val_date,
-                              _copom,
-                              holidays = self.holidays)
+        dus = self.calendar.busday_count(val_date,
+                                         _copom)
         
         # Calcula a quantidade de dias úteis entre os copoms
         diffs = np.append(dus[0], dus[1:] - dus[:-1])
@@ -221,7 +221,7 @@ class SimulaCenariosDI:
         # Primeiro tem que descobrir o tamanho máximo que impacta o último venc
         copom = np.array(self.copom).astype('datetime64[D]')
         maturities = np.array(maturities).astype('datetime64[D]')
-        maturities = np.busday_offset(maturities, 0, roll = 'forward', holidays = self.holidays)
+        maturities = self.calendar.roll(maturities, roll = 'forward')
         last_mat = np.max(maturities)
         
         # _n_copom é o número de COPOM que de fato afeta o vencimento
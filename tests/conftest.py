@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+"""
+Author : Milton Rocha
+Medium : https://medium.com/@milton-rocha
+"""
+
+import os
+import sys
+
+# Módulos do projeto ficam na raiz do repositório (from date_utils import ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Author : Milton Rocha
+Medium : https://medium.com/@milton-rocha
+"""
+
+import numpy as np
+import pytest
+
+pa  = pytest.importorskip('pyarrow')
+pq  = pytest.importorskip('pyarrow.parquet')
+ipc = pytest.importorskip('pyarrow.ipc')
+
+from columnar_io import (iter_positions,
+                         price_file)
+from pricer      import BondPortfolio
+
+VAL_DATE = '2022-07-29'
+
+def _posicoes(n : int = 25) -> 'pa.Table':
+
+    rng = np.random.default_rng(0)
+    return pa.table({'instrument' : np.where(rng.random(n) < .5, 'LTN', 'NTNF').tolist(),
+                     'maturity'   : pa.array(np.datetime64('2024-01-01') + rng.integers(0, 3000, n)),
+                     'yield'      : rng.uniform(.08, .14, n),
+                     'quantity'   : rng.integers(1, 100, n).astype(float)})
+
+def _escreve(tabela, path : str):
+
+    if path.endswith('.parquet'):
+        pq.write_table(tabela, path, row_group_size = 7)
+    else:
+        with ipc.new_file(path, tabela.schema) as w:
+            for lote in tabela.to_batches(max_chunksize = 7): w.write_batch(lote)
+
+@pytest.mark.parametrize('ext', ['.parquet', '.arrow'])
+def test_price_file_igual_bond_portfolio(tmp_path, ext):
+
+    tabela = _posicoes()
+    origem = str(tmp_path / f'pos{ext}')
+    _escreve(tabela, origem)
+
+    # batch_size vale para parquet e Arrow IPC
+    assert [len(l['yield']) for l in iter_positions(origem, batch_size = 10)] == [10, 10, 5]
+
+    saida  = str(tmp_path / 'res.parquet')
+    resumo = price_file(origem, saida, val_date = VAL_DATE, batch_size = 10)
+
+    p = BondPortfolio(VAL_DATE, tabela['instrument'].to_pylist(), tabela['maturity'].to_numpy(),
+                      tabela['yield'].to_numpy(), quantity = tabela['quantity'].to_numpy())
+
+    np.testing.assert_allclose(pq.read_table(saida)['price'].to_numpy(), p.price, rtol = 1e-12)
+    assert resumo['rows'] == 25 and resumo['batches'] == 3
+    assert abs(resumo['Valor'] - p.portfolio_value.sum()) < 1e-6
+
+def test_iter_positions_valores_nulos(tmp_path):
+
+    instrumentos = ['LTN'] * 25
+    instrumentos[17] = None
+
+    tabela = _posicoes().set_column(0, 'instrument', pa.array(instrumentos))
+    origem = str(tmp_path / 'pos.parquet')
+    _escreve(tabela, origem)
+
+    with pytest.raises(ValueError, match = "'instrument'.*linha 17"):
+        list(iter_positions(origem))
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Author : Milton Rocha
+Medium : https://medium.com/@milton-rocha
+"""
+
+import numpy as np
+
+from datetime   import datetime
+from date_utils import (BusinessCalendar,
+                        date_fmt_mapper,
+                        isofmt,
+                        parse_dates)
+
+FERIADOS = np.array(['2022-09-07', '2022-10-12', '2022-11-02', '2022-11-15', '2022-12-25'], dtype = 'datetime64[D]')
+
+def test_busday_count_igual_numpy_pares_invertidos():
+
+    # Datas em fins de semana e feriados, nos dois sentidos e com início = fim
+    cal   = BusinessCalendar(FERIADOS, inicio = '2022-01-01', fim = '2023-12-31')
+    datas = np.arange(np.datetime64('2022-08-25'), np.datetime64('2022-11-20'))
+
+    ini, fim = np.meshgrid(datas, datas, indexing = 'ij')
+
+    esperado = np.busday_count(ini, fim, busdaycal = cal.busdaycal)
+
+    np.testing.assert_array_equal(cal.busday_count(ini, fim), esperado)
+
+def test_busday_count_escalar_fim_de_semana():
+
+    cal = BusinessCalendar(FERIADOS, inicio = '2022-01-01', fim = '2023-12-31')
+
+    # Domingo -> sexta: (sexta, domingo] não tem dias úteis
+    assert cal.busday_count('2022-07-31', '2022-07-29') == np.busday_count('2022-07-31', '2022-07-29') == 0
+    assert cal.busday_count('2022-08-01', '2022-07-29') == np.busday_count('2022-08-01', '2022-07-29') == -1
+    assert cal.busday_count('2022-07-29', '2022-07-31') == np.busday_count('2022-07-29', '2022-07-31') == 1
+
+def test_busday_count_limites_do_calendario():
+
+    # Pares que tocam ou ultrapassam as bordas do índice acumulado
+    cal   = BusinessCalendar(FERIADOS, inicio = '2022-01-03', fim = '2022-01-16')
+    datas = np.arange(np.datetime64('2021-12-30'), np.datetime64('2022-01-20'))
+
+    ini, fim = np.meshgrid(datas, datas, indexing = 'ij')
+
+    np.testing.assert_array_equal(cal.busday_count(ini, fim),
+                                  np.busday_count(ini, fim, busdaycal = cal.busdaycal))
+
+    for i, f in [('2022-01-16', '2022-01-03'), ('2022-01-03', '2022-01-17'), ('2022-01-17', '2022-01-16')]:
+        assert cal.busday_count(i, f) == np.busday_count(i, f, busdaycal = cal.busdaycal)
+
+def test_isofmt_mantem_fromisoformat():
+
+    # Datas puras pelo caminho vetorizado, hora e fuso conforme datetime.fromisoformat
+    for datas in (['2022-07-29', '2023-01-02'], ['2022-07-29 10:30'], ['2022-07-29T10:30:00+00:00'], ['20220729']):
+        assert isofmt(datas) == [datetime.fromisoformat(d) for d in datas]
+
+def test_date_fmt_mapper_com_hora():
+
+    # Hora preservada (como no strftime sobre datetime.fromisoformat), dias puros pelo caminho vetorizado
+    assert date_fmt_mapper(['2024-01-05 10:30'], '%H:%M') == ['10:30']
+    assert date_fmt_mapper(['2024-01-05 10:30'], '%Y-%m-%d %H:%M') == ['2024-01-05 10:30']
+    assert date_fmt_mapper(['2024-01-05', '2024-12-31'], '%d/%m/%Y') == ['05/01/2024', '31/12/2024']
+
+def test_parse_dates_nulos_viram_nat():
+
+    datas = np.array([None, '01/02/2022', np.nan], dtype = object)
+
+    np.testing.assert_array_equal(parse_dates(datas, '%d/%m/%Y'),
+                                  np.array(['NaT', '2022-02-01', 'NaT'], dtype = 'datetime64[D]'))
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Author : Milton Rocha
+Medium : https://medium.com/@milton-rocha
+"""
+
+import numpy  as np
+import pytest
+
+from calc_utils      import (FlatForward,
+                             coupon_count_bound,
+                             coupon_schedule)
+from parallel_pricer import ParallelPricer
+from pricer          import (LFT,
+                             LTN,
+                             NTNB,
+                             NTNF,
+                             BondPortfolio,
+                             position_params)
+
+VAL_DATE = '2022-07-29'
+CLASSES  = {'LTN' : LTN, 'NTNF' : NTNF, 'NTNB' : NTNB, 'LFT' : LFT}
+
+def _curva() -> FlatForward:
+    return FlatForward([21, 252, 504, 1260, 2520], [.13, .135, .128, .125, .127], extrapolate = True)
+
+def _posicoes(n : int,
+              seed : int = 1) -> dict:
+
+    rng = np.random.default_rng(seed)
+    ins = rng.choice(list(CLASSES), n)
+
+    return {'instruments' : ins,
+            'maturities'  : np.datetime64('2023-01-01') + rng.integers(100, 9000, n),
+            'yields'      : rng.uniform(.05, .15, n),
+            'VNA'         : np.where(np.isin(ins, ['NTNB', 'LFT']), 4000., 1.),
+            'quantity'    : rng.integers(1, 1000, n).astype(float)}
+
+def test_coupon_count_bound_limita_fluxos():
+
+    p = _posicoes(2000)
+    frequencias = position_params(p['instruments'], len(p['instruments']))['coupon_frequency']
+
+    _, offsets = coupon_schedule(p['maturities'], frequencias, VAL_DATE)
+    limite     = coupon_count_bound(p['maturities'], frequencias, VAL_DATE)
+
+    assert (np.diff(offsets) <= limite).all()
+    assert (limite - np.diff(offsets) <= 2).all()
+
+def test_parallel_pricer_equivale_bonds():
+
+    p = _posicoes(12)
+    r = ParallelPricer(1, n_shards = 5)(VAL_DATE, p['instruments'], p['maturities'], p['yields'],
+                                        VNA = p['VNA'], quantity = p['quantity'])
+
+    for i, ins in enumerate(p['instruments']):
+
+        args = (VAL_DATE, str(p['maturities'][i]), p['yields'][i])
+        if ins in ('NTNB', 'LFT'): args += (p['VNA'][i],)
+
+        b = CLASSES[ins](*args, quantity = p['quantity'][i], bucketting = True)
+
+        np.testing.assert_allclose([r['price'][i], r['duration'][i], r['dv01'][i], r['convexity'][i]],
+                                   [b.price, b.duration, b.dv01, b.convexity], rtol = 1e-10)
+        np.testing.assert_allclose(r['krdv01'][i], [v[1] for v in b.curve_risks.values()], rtol = 1e-10, atol = 1e-12)
+
+def test_parallel_pricer_equivale_bonds_na_curva():
+
+    curva = _curva()
+    spreads = [.001, -.002, .0035]
+    vencimentos = ['2033-01-01', '2026-01-01', '2027-01-01']
+
+    r = ParallelPricer(1, n_shards = 3)(VAL_DATE, ['NTNF', 'LTN', 'NTNF'], vencimentos, .1,
+                                        yield_curve = curva, spread = spreads)
+
+    precos = [CLASSES[ins](VAL_DATE, venc, .1, yield_curve = curva, spread = s).price
+              for ins, venc, s in zip(['NTNF', 'LTN', 'NTNF'], vencimentos, spreads)]
+
+    np.testing.assert_allclose(r['price'], precos, rtol = 1e-12)
+
+@pytest.mark.parametrize('curva', [None, _curva()])
+def test_parallel_pricer_independe_de_processos_e_fatias(curva):
+
+    p = _posicoes(3000)
+    ref = BondPortfolio(VAL_DATE, p['instruments'], p['maturities'], p['yields'],
+                        VNA = p['VNA'], quantity = p['quantity'], yield_curve = curva)
+
+    for n_workers, n_shards in [(1, 1), (1, 7), (2, 5)]:
+
+        r = ParallelPricer(n_workers, n_shards)(VAL_DATE, p['instruments'], p['maturities'], p['yields'],
+                                                VNA = p['VNA'], quantity = p['quantity'], yield_curve = curva)
+
+        np.testing.assert_array_equal(r['price'], ref.price)
+        np.testing.assert_array_equal(r['dv01'], ref.dv01)
+        np.testing.assert_array_equal(r['krdv01'], ref.krdv01())
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Author : Milton Rocha
+Medium : https://medium.com/@milton-rocha
+"""
+
+import numpy  as np
+import pytest
+
+from calc_utils import FlatForward
+from pricer     import (LFT,
+                        LTN,
+                        NTNB,
+                        NTNF,
+                        BondPortfolio,
+                        BondTimeSeries,
+                        CarryRollEngine,
+                        ScenarioEngine,
+                        TickRepricer,
+                        bootstrap_curve)
+
+VAL_DATE = '2022-07-29'
+
+def _curva() -> FlatForward:
+    return FlatForward([21, 252, 504, 1260, 2520], [.13, .135, .128, .125, .127], extrapolate = True)
+
+def _bond(instrumento : str,
+          val_date    : str,
+          vencimento  : str,
+          taxa        : float,
+          VNA         : float = 1.,
+          **kwargs):
+
+    classe = {'LTN' : LTN, 'NTNF' : NTNF, 'NTNB' : NTNB, 'LFT' : LFT}[instrumento]
+
+    if instrumento in ('NTNB', 'LFT'): return classe(val_date, vencimento, taxa, VNA, **kwargs)
+    return classe(val_date, vencimento, taxa, **kwargs)
+
+def test_bond_portfolio_equivale_bonds():
+
+    instrumentos = ['NTNF', 'LTN', 'NTNB', 'LFT', 'NTNF']
+    vencimentos  = ['2033-01-01', '2026-01-01', '2045-05-15', '2027-03-01', '2022-08-01']
+    taxas        = [.129348, .127492, .062718, .001, .13]
+    VNAs         = [1., 1., 3985.783028, 12000., 1.]
+    quantidades  = [10., 5., 3., 7., 1.]
+
+    p = BondPortfolio(VAL_DATE, instrumentos, vencimentos, taxas, VNA = VNAs, quantity = quantidades)
+    krdv01 = p.krdv01()
+
+    for i, args in enumerate(zip(instrumentos, vencimentos, taxas, VNAs)):
+
+        b = _bond(args[0], VAL_DATE, *args[1:], quantity = quantidades[i], bucketting = True)
+
+        np.testing.assert_allclose([p.price[i], p.duration[i], p.mod_duration[i], p.dv01[i], p.convexity[i]],
+                                   [b.price, b.duration, b.mod_duration, b.dv01, b.convexity], rtol = 1e-12)
+        np.testing.assert_allclose(p.portfolio_value[i], b.portfolio_value, rtol = 1e-12)
+        np.testing.assert_allclose(krdv01[i], [v[1] for v in b.curve_risks.values()], rtol = 1e-12, atol = 1e-12)
+
+def test_bond_portfolio_na_curva_equivale_bonds():
+
+    curva = _curva()
+    bonds = [NTNF(VAL_DATE, '2033-01-01', .1, yield_curve = curva, spread = .001),
+             LTN(VAL_DATE, '2026-01-01', .1, yield_curve = curva, spread = -.002)]
+
+    p = BondPortfolio(VAL_DATE, ['NTNF', 'LTN'], ['2033-01-01', '2026-01-01'], .1,
+                      yield_curve = curva, spread = [.001, -.002])
+
+    np.testing.assert_allclose(p.price, [b.price for b in bonds], rtol = 1e-12)
+    np.testing.assert_allclose(BondPortfolio.from_bonds(bonds).price, p.price, rtol = 1e-12)
+
+@pytest.mark.parametrize('instrumento, vencimento', [('NTNF', '2027-01-01'), ('LTN', '2024-01-01'), ('NTNB', '2035-05-15')])
+def test_bond_time_series_equivale_bonds(instrumento, vencimento):
+
+    # Datas corridas (fins de semana e feriados inclusos), atravessando datas de cupom
+    datas = np.arange(np.datetime64('2021-12-20'), np.datetime64('2022-07-20'), 11)
+    rng   = np.random.default_rng(0)
+    taxas = rng.uniform(.05, .15, len(datas))
+    VNAs  = rng.uniform(3000., 4000., len(datas)) if instrumento == 'NTNB' else np.ones(len(datas))
+
+    ts = BondTimeSeries(datas, vencimento, taxas, instrumento, VNA = VNAs)
+
+    for i, (data, taxa, VNA) in enumerate(zip(datas, taxas, VNAs)):
+
+        b = _bond(instrumento, str(data), vencimento, taxa, VNA)
+
+        assert ts.val_dates[i] == b.val_date
+        np.testing.assert_allclose([ts.price[i], ts.duration[i], ts.mod_duration[i], ts.dv01[i], ts.convexity[i]],
+                                   [b.price, b.duration, b.mod_duration, b.dv01, b.convexity], rtol = 1e-12)
+
+def test_tick_repricer_equivale_bonds():
+
+    instrumentos = ['NTNF', 'LTN', 'NTNB', 'LFT']
+    vencimentos  = ['2033-01-01', '2026-01-01', '2045-05-15', '2027-03-01']
+    taxas        = [.12, .11, .06, .001]
+    VNAs         = [1., 1., 3985., 12000.]
+    quantidades  = [10., 5., 3., 7.]
+
+    tr = TickRepricer(BondPortfolio(VAL_DATE, instrumentos, vencimentos, taxas, VNA = VNAs, quantity = quantidades),
+                      keys = instrumentos)
+
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        i = int(rng.integers(0, len(instrumentos)))
+        taxas[i] = float(rng.uniform(.0, .15))
+        if instrumentos[i] in ('NTNB', 'LFT'): VNAs[i] = float(rng.uniform(3000., 13000.))
+        tr.update(instrumentos[i], taxas[i], VNAs[i] if instrumentos[i] in ('NTNB', 'LFT') else None)
+
+    bonds = [_bond(ins, VAL_DATE, venc, taxa, VNA, quantity = q, bucketting = True)
+             for ins, venc, taxa, VNA, q in zip(instrumentos, vencimentos, taxas, VNAs, quantidades)]
+
+    np.testing.assert_allclose(tr.price, [b.price for b in bonds], rtol = 1e-12)
+    np.testing.assert_allclose(tr.dv01, [b.dv01 for b in bonds], rtol = 1e-12)
+    np.testing.assert_allclose(tr.krdv01, [[v[1] for v in b.curve_risks.values()] for b in bonds], rtol = 1e-10, atol = 1e-12)
+
+    # Totais atualizados pela diferença, sem resync
+    np.testing.assert_allclose(tr.book_value, sum(b.portfolio_value for b in bonds), rtol = 1e-10)
+    np.testing.assert_allclose(tr.book_dv01, sum(b.portfolio_dv01 for b in bonds), rtol = 1e-10)
+
+    with pytest.raises(ValueError):
+        TickRepricer(BondPortfolio(VAL_DATE, 'LTN', '2026-01-01', .1, yield_curve = _curva()))
+
+def test_scenario_engine_apos_update_da_curva():
+
+    curva = _curva()
+    p = BondPortfolio(VAL_DATE, ['NTNF', 'LTN'], ['2033-01-01', '2026-01-01'], .1,
+                      yield_curve = curva, quantity = [100, 50])
+    e = ScenarioEngine(p)
+
+    # Atualização de vértice existente: choque nulo continua com P&L nulo
+    curva.update(504, .2)
+    np.testing.assert_allclose(e(0.)['pnl'], 0., atol = 1e-9)
+
+    # Inserção de vértice: mesmos preços de um engine novo e dos Bonds na curva chocada
+    curva.update(100, .2)
+    choques = np.random.default_rng(0).normal(0, .01, (3, len(curva.maturities)))
+    precos  = e(choques)['prices']
+
+    np.testing.assert_allclose(precos, ScenarioEngine(p)(choques)['prices'], rtol = 1e-12)
+
+    chocada = FlatForward(curva.maturities, curva.yields + choques[1], extrapolate = True)
+    np.testing.assert_allclose(precos[1], [NTNF(VAL_DATE, '2033-01-01', .1, yield_curve = chocada).price,
+                                           LTN(VAL_DATE, '2026-01-01', .1, yield_curve = chocada).price], rtol = 1e-12)
+
+def test_carry_roll_engine_apos_update_da_curva():
+
+    curva = _curva()
+    p = BondPortfolio(VAL_DATE, ['NTNF', 'LTN'], ['2033-01-01', '2026-01-01'], .1, yield_curve = curva)
+    e = CarryRollEngine(p)
+
+    for vertice, taxa in ((504, .2), (100, .2)):
+        curva.update(vertice, taxa)
+        r = e([0, 21, 126])
+
+        # Em h = 0 carry e roll-down são nulos, e o resultado é o de um engine construído na curva atual
+        np.testing.assert_allclose(r['carry'][0], 0., atol = 1e-7)
+        np.testing.assert_allclose(r['roll_down'][0], 0., atol = 1e-7)
+        np.testing.assert_allclose(r['roll_down'], CarryRollEngine(p)([0, 21, 126])['roll_down'], atol = 1e-7)
+
+def test_bootstrap_curve_reprecifica_e_valida_instrumentos():
+
+    vencimentos = ['2023-01-01', '2024-01-01', '2027-01-01']
+    tipos       = ['LTN', 'LTN', 'NTNF']
+    precos      = [LTN(VAL_DATE, vencimentos[0], .13).price,
+                   LTN(VAL_DATE, vencimentos[1], .135).price,
+                   NTNF(VAL_DATE, vencimentos[2], .125).price]
+
+    curva = bootstrap_curve(VAL_DATE, vencimentos, precos, tipos)
+
+    np.testing.assert_allclose([LTN(VAL_DATE, vencimentos[0], .1, yield_curve = curva).price,
+                                LTN(VAL_DATE, vencimentos[1], .1, yield_curve = curva).price,
+                                NTNF(VAL_DATE, vencimentos[2], .1, yield_curve = curva).price], precos, atol = 1e-8)
+
+    for invalidos in (['LTN', 'XYZ', 'NTNF'], ['LTN', 'NTNB', 'NTNF']):
+        with pytest.raises(ValueError):
+            bootstrap_curve(VAL_DATE, vencimentos, precos, invalidos)
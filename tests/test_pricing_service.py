@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""
+Author : Milton Rocha
+Medium : https://medium.com/@milton-rocha
+"""
+
+import asyncio
+
+from pricer          import LTN
+from pricing_service import PricingService
+
+VALIDA = {'id' : 1, 'instrument' : 'LTN', 'val_date' : '2022-07-29', 'maturity' : '2026-01-01', 'yield' : .1}
+
+def test_requisicoes_invalidas_nao_afetam_o_lote():
+
+    async def __lote__():
+        servico = PricingService(max_wait_ms = 50)
+        try:
+            return await asyncio.gather(servico.price(VALIDA),
+                                        servico.price([1, 2]),
+                                        servico.price(None),
+                                        servico.price({**VALIDA, 'id' : 2, 'val_date' : None}),
+                                        servico.price({**VALIDA, 'id' : 3, 'instrument' : 'XYZ'}))
+        finally:
+            await servico.close()
+
+    valida, lista, nula, sem_data, desconhecido = asyncio.run(__lote__())
+
+    assert abs(valida['price'] - LTN('2022-07-29', '2026-01-01', .1).price) < 1e-9
+    assert 'TypeError' in lista['error'] and 'TypeError' in nula['error']
+    assert sem_data['id'] == 2 and 'val_date' in sem_data['error']
+    assert desconhecido['id'] == 3 and 'XYZ' in desconhecido['error']